@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+__description__ = ("Compare the run time of the backends of "
+                   "GeneListMerger.")
+__author__ = "Konrad Foerstner <konrad@foerstner.org>"
+__copyright__ = "2014 by Konrad Foerstner <konrad@foerstner.org>"
+__license__ = "ISC license"
+__email__ = "konrad@foerstner.org"
+__version__ = ""
+
+import argparse
+import random
+import sys
+import time
+sys.path.append(".")
+from kufpybio.gene import Gene
+from kufpybio.genelistmerger import GeneListMerger
+
+def main():
+    parser = argparse.ArgumentParser(description=__description__)
+    parser.add_argument("--genes_per_list", type=int, nargs="+",
+                        default=[1000, 4000, 16000])
+    parser.add_argument("--lists", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "memory"])
+    parser.add_argument("--min_overlap_percentage", type=float, default=None)
+    args = parser.parse_args()
+    print("\t".join(["Genes"] + ["%s (s)" % backend
+                                 for backend in args.backends] +
+                    ["%s merge_sorted (s)" % backend
+                     for backend in args.backends]))
+    for gene_number in args.genes_per_list:
+        gene_lists = generate_gene_lists(args.lists, gene_number)
+        times = []
+        for backend in args.backends:
+            start_time = time.time()
+            gene_list_merger = GeneListMerger(
+                args.min_overlap_percentage, backend=backend)
+            for gene_list in gene_lists:
+                gene_list_merger.add_genes(gene_list)
+            gene_list_merger.merged_genes()
+            gene_list_merger.cleanup()
+            times.append("%.3f" % (time.time() - start_time))
+        for backend in args.backends:
+            start_time = time.time()
+            gene_list_merger = GeneListMerger(
+                args.min_overlap_percentage, backend=backend)
+            gene_list_merger.merge_sorted(gene_lists)
+            gene_list_merger.merged_genes()
+            gene_list_merger.cleanup()
+            times.append("%.3f" % (time.time() - start_time))
+        print("\t".join([str(gene_number * args.lists)] + times))
+
+def generate_gene_lists(list_number, gene_number):
+    """Generate gene lists of a genome with one gene per kb."""
+    random.seed(1)
+    gene_lists = []
+    for list_index in range(list_number):
+        gene_list = []
+        for gene_index in range(gene_number):
+            start = random.randint(1, gene_number * 1000)
+            gene_list.append(Gene(
+                "chrom", "g%s_%s" % (list_index, gene_index), "", start,
+                start + random.randint(100, 1000), random.choice("+-")))
+        gene_lists.append(gene_list)
+    return gene_lists
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+__description__ = ("Compare the run time of the different parsing modes "
+                   "of Gff3Parser.")
+__author__ = "Konrad Foerstner <konrad@foerstner.org>"
+__copyright__ = "2014 by Konrad Foerstner <konrad@foerstner.org>"
+__license__ = "ISC license"
+__email__ = "konrad@foerstner.org"
+__version__ = ""
+
+import argparse
+import random
+import sys
+import time
+from io import StringIO
+sys.path.append(".")
+from kufpybio.gff3 import Gff3Parser
+
+def main():
+    parser = argparse.ArgumentParser(description=__description__)
+    parser.add_argument("--gff_file", default=None,
+                        help="GFF3 file to parse. If not given a random "
+                        "one is generated.")
+    parser.add_argument("--entries", type=int, default=200000,
+                        help="Number of entries of the generated file.")
+    parser.add_argument("--feature", default="gene",
+                        help="Feature used for the filtered modes.")
+    args = parser.parse_args()
+    if args.gff_file:
+        gff_content = open(args.gff_file).read()
+    else:
+        gff_content = generate_gff(args.entries)
+    gff3_parser = Gff3Parser()
+    modes_and_functions = [
+        ("entries", lambda fh: list(gff3_parser.entries(fh))),
+        ("fast_entries", lambda fh: list(gff3_parser.fast_entries(fh))),
+        ("fast_entries (%s only)" % args.feature,
+         lambda fh: list(gff3_parser.fast_entries(
+             fh, features=[args.feature]))),
+        ("columns", lambda fh: gff3_parser.columns(fh)),
+        ("columns (%s only)" % args.feature,
+         lambda fh: gff3_parser.columns(fh, features=[args.feature]))]
+    print("Mode\tTime (s)")
+    for mode, function in modes_and_functions:
+        start_time = time.time()
+        function(StringIO(gff_content))
+        print("%s\t%.3f" % (mode, time.time() - start_time))
+
+def generate_gff(entry_number):
+    random.seed(1)
+    lines = ["##gff-version 3"]
+    for entry_index in range(entry_number):
+        start = entry_index * 500 + random.randint(1, 100)
+        lines.append("\t".join([
+            "chrom", "RefSeq", random.choice(["gene", "CDS", "exon"]),
+            str(start), str(start + random.randint(100, 1000)), ".",
+            random.choice("+-"), ".",
+            "ID=feature%s;Name=abc%s;locus_tag=L_%s;product=hypothetical "
+            "protein" % (entry_index, entry_index, entry_index)]))
+    return "\n".join(lines) + "\n"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+__description__ = ("Measure the run time of the TSS to gene mapping for "
+                   "growing numbers of TSS and genes.")
+__author__ = "Konrad Foerstner <konrad@foerstner.org>"
+__copyright__ = "2014 by Konrad Foerstner <konrad@foerstner.org>"
+__license__ = "ISC license"
+__email__ = "konrad@foerstner.org"
+__version__ = ""
+
+import argparse
+import math
+import random
+import sys
+import time
+sys.path.append(".")
+from kufpybio.gene import Gene
+from kufpybio.tss import TSS
+import kufpybio.tssgenemapper as tssgenemapper
+
+def main():
+    parser = argparse.ArgumentParser(description=__description__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 2000, 4000, 8000, 16000])
+    parser.add_argument("--tss_per_gene", type=int, default=40)
+    parser.add_argument("--with_all_pairs", default=False,
+                        action="store_true",
+                        help="Also time the check of every TSS-gene pair.")
+    args = parser.parse_args()
+    benchmark = TSSGeneMappingBenchmark()
+    print("\t".join(["Genes", "TSS", "Indexed (s)",
+                     "Indexed / ((T+G) log G) (ns)", "All pairs (s)"]))
+    for gene_number in args.sizes:
+        gene_list, tss_list = benchmark.create_data(
+            gene_number, gene_number * args.tss_per_gene)
+        indexed_time = benchmark.time_indexed(tss_list, gene_list)
+        all_pairs_time = "-"
+        if args.with_all_pairs:
+            all_pairs_time = "%.3f" % benchmark.time_all_pairs(
+                tss_list, gene_list)
+        normalized_time = indexed_time / (
+            (len(tss_list) + len(gene_list)) * math.log(len(gene_list)))
+        print("\t".join([str(len(gene_list)), str(len(tss_list)),
+                         "%.3f" % indexed_time,
+                         "%.1f" % (normalized_time * 1e9), all_pairs_time]))
+
+class TSSGeneMappingBenchmark(object):
+
+    def create_data(self, gene_number, tss_number):
+        """Generate a genome with one gene per kb and randomly
+        distributed TSS.
+
+        """
+        random.seed(1)
+        genome_length = gene_number * 1000
+        gene_list = []
+        for gene_index in range(gene_number):
+            start = gene_index * 1000 + random.randint(1, 300)
+            gene_list.append(Gene(
+                "genomeX", "g%s" % gene_index, "g%s" % gene_index, start,
+                start + random.randint(100, 1200), random.choice("+-")))
+        # Each position/strand combination is used only once
+        tss_list = [
+            TSS("genomeX", pos_and_strand // 2, "+-"[pos_and_strand % 2])
+            for pos_and_strand in random.sample(
+                range(2, 2 * genome_length + 2), tss_number)]
+        return gene_list, tss_list
+
+    def time_indexed(self, tss_list, gene_list):
+        start_time = time.time()
+        tssgenemapper.TSSGeneMapper().map_tss(tss_list, gene_list)
+        return time.time() - start_time
+
+    def time_all_pairs(self, tss_list, gene_list):
+        start_time = time.time()
+        tss_gene_mapper = tssgenemapper.TSSGeneMapper()
+        tss_gene_mapper.tss_and_hit_genes = {}
+        tss_gene_mapper.genes_and_5_prime_tss = {}
+        for tss in tss_list:
+            for gene in gene_list:
+                tss_gene_mapper._check_tss_gene_associations(tss, gene)
+        return time.time() - start_time
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+__description__ = ("Compare the run time of the line by line and the bulk "
+                   "parsing of WiggleParser.")
+__author__ = "Konrad Foerstner <konrad@foerstner.org>"
+__copyright__ = "2014 by Konrad Foerstner <konrad@foerstner.org>"
+__license__ = "ISC license"
+__email__ = "konrad@foerstner.org"
+__version__ = ""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.append(".")
+from kufpybio.wiggle import WiggleParser
+
+def main():
+    parser = argparse.ArgumentParser(description=__description__)
+    parser.add_argument("--wiggle_file", default=None,
+                        help="Wiggle file to parse. If not given a random "
+                        "one is generated.")
+    parser.add_argument("--positions", type=int, default=1000000,
+                        help="Number of positions per replicon of the "
+                        "generated file.")
+    parser.add_argument("--replicons", type=int, default=2,
+                        help="Number of replicons of the generated file.")
+    parser.add_argument("--decimals", type=int, default=None,
+                        help="Round the values of the generated file to "
+                        "this number of decimals.")
+    args = parser.parse_args()
+    if args.wiggle_file:
+        wiggle_file = args.wiggle_file
+    else:
+        wiggle_fd, wiggle_file = tempfile.mkstemp(suffix=".wig")
+        with os.fdopen(wiggle_fd, "w") as wiggle_fh:
+            wiggle_fh.write(generate_wiggle(
+                args.replicons, args.positions, args.decimals))
+    wiggle_parser = WiggleParser()
+    modes_and_functions = [
+        ("entries", wiggle_parser.entries),
+        ("fast_entries", wiggle_parser.fast_entries)]
+    print("Mode\tTime (s)")
+    for mode, function in modes_and_functions:
+        start_time = time.time()
+        with open(wiggle_file) as wiggle_fh:
+            list(function(wiggle_fh))
+        print("%s\t%.3f" % (mode, time.time() - start_time))
+    if not args.wiggle_file:
+        os.remove(wiggle_file)
+
+def generate_wiggle(replicon_number, position_number, decimals=None):
+    random.seed(1)
+    lines = ["track type=wiggle_0 name=\"benchmark\""]
+    for replicon_index in range(replicon_number):
+        lines.append("variableStep chrom=replicon%s span=1" % replicon_index)
+        for pos in range(1, position_number + 1):
+            value = random.randint(1, 10000) / 7.0
+            if decimals is not None:
+                value = round(value, decimals)
+            lines.append("%s %s" % (pos, value))
+    return "\n".join(lines) + "\n"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from kufpybio.gff3 import Gff3Parser
+
+def is_cacheable(gff_fh):
+    """Return whether the file handle belongs to a regular file that
+    can be loaded by AnnotationCache (unlike e.g. standard input or
+    a pipe).
+
+    """
+    file_name = getattr(gff_fh, "name", None)
+    return isinstance(file_name, str) and os.path.isfile(file_name)
+
+class AnnotationCache(object):
+    """A binary cache of parsed GFF3/GTF files
+
+    The first time a file is loaded it is parsed and its entries are
+    stored in a cache directory. The key of an entry is the SHA1 hash
+    of the file content so changed files are parsed again. To avoid
+    reading the whole file on each load, the hash is stored together
+    with the size and modification time of the file (in the
+    subdirectory file_stats) and only computed again if they changed.
+    Each cached file is a directory containing
+    - start.npy and end.npy: the coordinates
+    - one .npy file for each of the other columns with positions in
+      a table of unique strings
+    - strings.json: the string table
+    The arrays are memory-mapped when a cached file is loaded.
+
+    Example:
+    annotation_cache = AnnotationCache()
+    annotation_table = annotation_cache.load("genome.gff")
+    for entry in annotation_table.records(features=["gene"]):
+        print(entry.attributes["locus_tag"])
+
+    """
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                os.path.expanduser("~"), ".kufpybio_cache")
+        self._cache_dir = cache_dir
+
+    def load(self, gff_file, parser=None):
+        """Return the entries of the GFF file as AnnotationTable
+
+        The parser (default: Gff3Parser) is used to parse the file if
+        it is not in the cache yet and determines the type of the
+        records (e.g. GtfRecord for a GtfParser).
+
+        """
+        if parser is None:
+            parser = Gff3Parser()
+        table_dir = os.path.join(self._cache_dir, self._file_hash(gff_file))
+        if not os.path.exists(table_dir):
+            with open(gff_file) as gff_fh:
+                self._store(parser._rows(gff_fh, None), table_dir)
+        return AnnotationTable(table_dir, parser)
+
+    def _store(self, rows, table_dir):
+        """Write the rows to a temporary directory that is then moved
+        to its final place so that concurrent jobs never read
+        incomplete data.
+
+        """
+        strings_and_positions = {}
+        string_columns = dict(
+            [(column_name, []) for column_name
+             in AnnotationTable.string_column_names])
+        starts = []
+        ends = []
+        for row in rows:
+            start, end = int(row[3]), int(row[4])
+            if start > end:
+                start, end = end, start
+            starts.append(start)
+            ends.append(end)
+            for column_name, column_pos in zip(
+                    AnnotationTable.string_column_names,
+                    AnnotationTable.string_column_positions):
+                string_columns[column_name].append(
+                    strings_and_positions.setdefault(
+                        row[column_pos], len(strings_and_positions)))
+        if not os.path.exists(self._cache_dir):
+            os.makedirs(self._cache_dir)
+        tmp_dir = tempfile.mkdtemp(dir=self._cache_dir)
+        np.save(os.path.join(tmp_dir, "start.npy"),
+                np.array(starts, dtype=np.int64))
+        np.save(os.path.join(tmp_dir, "end.npy"),
+                np.array(ends, dtype=np.int64))
+        for column_name, string_positions in string_columns.items():
+            np.save(os.path.join(tmp_dir, "%s.npy" % column_name),
+                    np.array(string_positions, dtype=np.uint32))
+        strings = [None] * len(strings_and_positions)
+        for string, string_pos in strings_and_positions.items():
+            strings[string_pos] = string
+        with open(os.path.join(tmp_dir, "strings.json"), "w") as strings_fh:
+            json.dump(strings, strings_fh)
+        try:
+            os.rename(tmp_dir, table_dir)
+        except OSError:
+            # Another process stored the same file in the meantime.
+            shutil.rmtree(tmp_dir)
+
+    def _file_hash(self, gff_file):
+        """Return the stored content hash of the file if its size and
+        modification time did not change. Otherwise compute and store
+        it.
+
+        """
+        file_stat = os.stat(gff_file)
+        file_stats = [file_stat.st_size, file_stat.st_mtime]
+        stats_dir = os.path.join(self._cache_dir, "file_stats")
+        stats_file = os.path.join(stats_dir, "%s.json" % hashlib.sha1(
+            os.path.abspath(gff_file).encode("utf-8")).hexdigest())
+        if os.path.exists(stats_file):
+            with open(stats_file) as stats_fh:
+                stats_data = json.load(stats_fh)
+            if stats_data["file_stats"] == file_stats:
+                return stats_data["file_hash"]
+        file_hash = self._content_hash(gff_file)
+        if not os.path.exists(stats_dir):
+            os.makedirs(stats_dir)
+        # Write to a temporary file that is then moved to its final
+        # place so that concurrent jobs never read incomplete data.
+        tmp_stats_fh, tmp_stats_file = tempfile.mkstemp(dir=stats_dir)
+        with os.fdopen(tmp_stats_fh, "w") as stats_fh:
+            json.dump({"file_stats": file_stats, "file_hash": file_hash},
+                      stats_fh)
+        os.replace(tmp_stats_file, stats_file)
+        return file_hash
+
+    def _content_hash(self, gff_file, block_size=2**20):
+        file_hash = hashlib.sha1()
+        with open(gff_file, "rb") as gff_fh:
+            for block in iter(lambda: gff_fh.read(block_size), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+class AnnotationTable(object):
+    """The entries of a cached GFF file
+
+    The start and end positions are available as the arrays
+    self.starts and self.ends. The other columns are stored as
+    positions in the string table self.strings.
+
+    """
+
+    string_column_names = ["seq_id", "source", "feature", "score",
+                           "strand", "phase", "attributes"]
+    string_column_positions = [0, 1, 2, 5, 6, 7, 8]
+
+    def __init__(self, table_dir, parser):
+        self._parser = parser
+        self.starts = np.load(
+            os.path.join(table_dir, "start.npy"), mmap_mode="r")
+        self.ends = np.load(os.path.join(table_dir, "end.npy"), mmap_mode="r")
+        self._string_columns = dict(
+            [(column_name, np.load(
+                os.path.join(table_dir, "%s.npy" % column_name),
+                mmap_mode="r"))
+             for column_name in self.string_column_names])
+        with open(os.path.join(table_dir, "strings.json")) as strings_fh:
+            self.strings = json.load(strings_fh)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def column(self, column_name):
+        """Return the string column as list of strings."""
+        strings = self.strings
+        return [strings[string_pos]
+                for string_pos in self._string_columns[column_name]]
+
+    def string_positions(self, column_name):
+        """Return the string column as array of positions in the
+        string table.
+
+        """
+        return self._string_columns[column_name]
+
+    def records(self, features=None):
+        """Return the entries as light-weight entries (see
+        Gff3Record). If an iterable of features is given, only entries
+        of these features are returned.
+
+        """
+        if features is None:
+            entry_indices = np.arange(len(self))
+        else:
+            features = set(features)
+            feature_string_positions = [
+                string_pos for string_pos, string in enumerate(self.strings)
+                if string in features]
+            entry_indices = np.flatnonzero(np.isin(
+                self._string_columns["feature"], feature_string_positions))
+        strings = self.strings
+        string_columns = [
+            self._string_columns[column_name][entry_indices].tolist()
+            for column_name in self.string_column_names]
+        for (seq_id, source, feature, score, strand, phase, attributes,
+             start, end) in zip(*(string_columns + [
+                 self.starts[entry_indices].tolist(),
+                 self.ends[entry_indices].tolist()])):
+            yield self._parser._row_to_record([
+                strings[seq_id], strings[source], strings[feature], start,
+                end, strings[score], strings[strand], strings[phase],
+                strings[attributes]])
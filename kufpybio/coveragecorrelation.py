@@ -0,0 +1,210 @@
+import numpy as np
+
+class CoverageCorrelator(object):
+    """Correlate the coverages of libraries
+
+    The coverages are given as sorted arrays of positions and the
+    corresponding values (e.g. WiggleEntry.positions and
+    WiggleEntry.values). Positions that are only covered in one
+    library get the value 0.0 in the other one.
+
+    Example:
+    coverage_correlator = CoverageCorrelator()
+    values_1, values_2 = coverage_correlator.merge(
+        entry_1.positions, entry_1.values, entry_2.positions,
+        entry_2.values)
+    coverage_correlator.pearson(values_1, values_2)
+
+    """
+
+    def merge(self, positions_1, values_1, positions_2, values_2):
+        """Return the values of both libraries for the union of their
+        positions.
+
+        If a position occurs several times in a library its last
+        value is used.
+
+        """
+        positions_1, values_1 = self._unique(positions_1, values_1)
+        positions_2, values_2 = self._unique(positions_2, values_2)
+        positions = np.union1d(positions_1, positions_2)
+        return (self._values_at(positions, positions_1, values_1),
+                self._values_at(positions, positions_2, values_2))
+
+    def merge_libraries(self, positions_list, values_list):
+        """Return the values of any number of libraries for the union
+        of their positions as matrix with one row per library.
+
+        """
+        unique_positions_and_values = [
+            self._unique(positions, values)
+            for positions, values in zip(positions_list, values_list)]
+        positions = np.unique(np.concatenate(
+            [np.zeros(0, dtype=np.int64)] + [
+                library_positions for library_positions, library_values
+                in unique_positions_and_values]))
+        value_matrix = np.zeros(
+            (len(unique_positions_and_values), len(positions)),
+            dtype=np.float64)
+        for row, (library_positions, library_values) in enumerate(
+                unique_positions_and_values):
+            value_matrix[row] = self._values_at(
+                positions, library_positions, library_values)
+        return value_matrix
+
+    def correlation_matrix(self, value_matrix, method="pearson"):
+        """Return the matrix of the Pearson or Spearman correlation
+        coefficients of all pairs of rows of the value matrix.
+
+        """
+        value_matrix = np.asarray(value_matrix, dtype=np.float64)
+        if method == "spearman":
+            value_matrix = np.array([self.ranks(values)
+                                     for values in value_matrix])
+        elif method != "pearson":
+            raise ValueError("Unknown correlation method \"%s\"." % method)
+        correlation_matrix_accumulator = CorrelationMatrixAccumulator(
+            value_matrix.shape[0])
+        correlation_matrix_accumulator.add(value_matrix)
+        return correlation_matrix_accumulator.pearson()
+
+    def pearson(self, values_1, values_2):
+        """Return the Pearson correlation coefficient."""
+        correlation_accumulator = CorrelationAccumulator()
+        correlation_accumulator.add(values_1, values_2)
+        return correlation_accumulator.pearson()
+
+    def spearman(self, values_1, values_2):
+        """Return the Spearman correlation coefficient.
+
+        This is the Pearson correlation coefficient of the ranks (tied
+        values get the mean of their ranks). As the ranks depend on all
+        values it can't be computed in a streaming pass.
+
+        """
+        return self.pearson(self.ranks(values_1), self.ranks(values_2))
+
+    def ranks(self, values):
+        """Return the ranks (starting with 1) of the values. Tied
+        values get the mean of their ranks.
+
+        """
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(values, kind="mergesort")
+        sorted_values = values[order]
+        # Positions in the sorted values at which a new value starts
+        group_starts = np.flatnonzero(np.concatenate(
+            ([True], sorted_values[1:] != sorted_values[:-1])))
+        group_ends = np.concatenate((group_starts[1:], [len(values)]))
+        mean_ranks = (group_starts + group_ends + 1) / 2.0
+        ranks = np.empty(len(values), dtype=np.float64)
+        ranks[order] = np.repeat(mean_ranks, group_ends - group_starts)
+        return ranks
+
+    def _unique(self, positions, values):
+        positions = np.asarray(positions, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if len(positions) < 2 or (np.diff(positions) > 0).all():
+            return positions, values
+        # Search the last occurrence of each position by looking at
+        # the reversed arrays.
+        unique_positions, reversed_indices = np.unique(
+            positions[::-1], return_index=True)
+        return unique_positions, values[::-1][reversed_indices]
+
+    def _values_at(self, positions, library_positions, library_values):
+        values = np.zeros(len(positions), dtype=np.float64)
+        values[np.searchsorted(positions, library_positions)] = (
+            library_values)
+        return values
+
+class CorrelationMatrixAccumulator(object):
+    """Compute the Pearson correlation coefficients of all pairs of
+    libraries from chunks of values.
+
+    Each chunk is a matrix with one row per library and one column per
+    position. Instead of keeping the values only their number, the
+    means of the libraries and the sums of the products of the
+    deviations of each pair of libraries are kept. The statistics of
+    each chunk are computed with NumPy and combined with the ones of
+    the previous chunks. This avoids the loss of precision of plain
+    running sums of squares. Accumulators of different chunks (e.g.
+    computed in different processes) can be combined with
+    add_accumulator.
+
+    """
+
+    def __init__(self, library_number):
+        self.library_number = library_number
+        self.value_number = 0
+        self._means = np.zeros(library_number, dtype=np.float64)
+        self._deviation_products = np.zeros(
+            (library_number, library_number), dtype=np.float64)
+
+    def add(self, value_matrix):
+        value_matrix = np.asarray(value_matrix, dtype=np.float64)
+        if value_matrix.shape[0] != self.library_number:
+            raise ValueError("The value matrix has %s instead of %s rows." % (
+                value_matrix.shape[0], self.library_number))
+        if value_matrix.shape[1] == 0:
+            return
+        means = value_matrix.mean(axis=1)
+        deviations = value_matrix - means[:, np.newaxis]
+        self._combine(value_matrix.shape[1], means,
+                      np.dot(deviations, deviations.T))
+
+    def add_accumulator(self, correlation_matrix_accumulator):
+        if correlation_matrix_accumulator.value_number == 0:
+            return
+        self._combine(correlation_matrix_accumulator.value_number,
+                      correlation_matrix_accumulator._means,
+                      correlation_matrix_accumulator._deviation_products)
+
+    def pearson(self):
+        """Return the matrix of the Pearson correlation coefficients.
+        Coefficients that are not defined (less than two values or
+        constant values) are NaN.
+
+        """
+        deviation_sums = np.sqrt(np.diag(self._deviation_products))
+        denominators = np.outer(deviation_sums, deviation_sums)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            coefficients = np.clip(
+                self._deviation_products / denominators, -1.0, 1.0)
+        coefficients[denominators == 0.0] = np.nan
+        if self.value_number < 2:
+            coefficients[:] = np.nan
+        return coefficients
+
+    def _combine(self, value_number, means, deviation_products):
+        total_value_number = self.value_number + value_number
+        mean_differences = means - self._means
+        self._deviation_products += deviation_products + np.outer(
+            mean_differences, mean_differences) * (
+                self.value_number * value_number / float(total_value_number))
+        self._means += mean_differences * value_number / float(
+            total_value_number)
+        self.value_number = total_value_number
+
+class CorrelationAccumulator(CorrelationMatrixAccumulator):
+    """Compute the Pearson correlation coefficient of pairs of values
+    that are added chunk by chunk (see CorrelationMatrixAccumulator).
+
+    """
+
+    def __init__(self):
+        CorrelationMatrixAccumulator.__init__(self, 2)
+
+    def add(self, values_1, values_2):
+        values_1 = np.asarray(values_1, dtype=np.float64)
+        values_2 = np.asarray(values_2, dtype=np.float64)
+        if len(values_1) != len(values_2):
+            raise ValueError("The value arrays differ in length.")
+        CorrelationMatrixAccumulator.add(self, np.vstack((values_1, values_2)))
+
+    def pearson(self):
+        """Return the Pearson correlation coefficient or NaN if it is
+        not defined (less than two values or constant values).
+
+        """
+        return float(CorrelationMatrixAccumulator.pearson(self)[0, 1])
@@ -1,50 +1,105 @@
+from bisect import bisect_left, bisect_right, insort
+import heapq
 import os
 import sys
+import tempfile
 import kufpybio.helpers as helpers
 import sqlite3
 from kufpybio.gene import Gene
 
 class GeneListMerger(object):
 
-    def __init__(self, min_overlap_percentage=None, perform_gene_merging=True):
+    def __init__(self, min_overlap_percentage=None, perform_gene_merging=True,
+                 backend="sqlite", tmp_dir=None):
         # This flag influeces the general behavior. It it is set to
         # True gene will be merged i.e. the minimal star position
         # value and maximum end position taken. If it is False new
         # genes that are overlapping with old ones will be discarded.
         self._perform_gene_merging = perform_gene_merging
         self._min_overlap_percentage = min_overlap_percentage
-        self._tmp_db_file = 'tmp.db'
-        self._conn = sqlite3.connect(self._tmp_db_file)
-        self._cur = self._conn.cursor()
-        self._create_table()
+        # The backend stores the genes. "sqlite" uses a temporary
+        # SQLite database file (in tmp_dir), "memory" sorted lists
+        # per chromosome and strand. Both give the same result.
+        if backend == "sqlite":
+            self._gene_store = SQLiteGeneStore(tmp_dir)
+        elif backend == "memory":
+            self._gene_store = MemoryGeneStore()
+        else:
+            raise ValueError("Unknown backend '%s'." % backend)
 
     def add_genes(self, genes_to_add):
         for gene in genes_to_add:
             self._test_and_add(gene)
+        self._gene_store.commit()
+
+    def merge_sorted(self, gene_lists):
+        """Merge whole gene lists in a single sweep.
+
+        All genes of the lists (and the ones added before) are sorted
+        by chromosome, strand and start position and are merged into
+        clusters in one pass:
+        - With gene merging a gene that sufficiently overlaps (see
+          min_overlap_percentage) the current cluster is merged into
+          it. Like with add_genes a gene that overlaps the cluster
+          insufficiently is discarded. Any other gene starts a new
+          cluster.
+        - Without gene merging a gene that overlaps the previously
+          kept gene is discarded.
+
+        Unlike with add_genes, the result does not depend on the order
+        of the genes in the lists.
+
+        """
+        stored_rows = self._gene_store.genes()
+        for row_id, gene in stored_rows:
+            self._gene_store.remove(row_id)
+        genes = [gene for row_id, gene in stored_rows] + [
+            gene for gene_list in gene_lists for gene in gene_list]
+        genes.sort(key=lambda gene: (gene.seq_id, gene.strand, gene.start))
+        self._gene_store.add_many(self._sweep(genes))
+        self._gene_store.commit()
+
+    def _sweep(self, sorted_genes):
+        cluster = None
+        cluster_gene_ids = []
+        for gene in sorted_genes:
+            if (cluster is not None and cluster.seq_id == gene.seq_id and
+                cluster.strand == gene.strand):
+                if self._perform_gene_merging is False:
+                    # Discard genes overlapping the last kept one
+                    if cluster.end >= gene.start:
+                        continue
+                elif self._have_sufficient_overlap(gene, cluster) is True:
+                    cluster_gene_ids.append(gene.gene_id)
+                    cluster = Gene(cluster.seq_id, None, None, cluster.start,
+                                   max(cluster.end, gene.end), cluster.strand)
+                    continue
+                elif cluster.end >= gene.start:
+                    # Discard genes overlapping the cluster
+                    # insufficiently
+                    continue
+            if cluster is not None:
+                yield self._cluster_gene(cluster, cluster_gene_ids)
+            cluster = gene
+            cluster_gene_ids = [gene.gene_id]
+        if cluster is not None:
+            yield self._cluster_gene(cluster, cluster_gene_ids)
+
+    def _cluster_gene(self, cluster, cluster_gene_ids):
+        gene_id = "_merged_with_".join(cluster_gene_ids)
+        return Gene(cluster.seq_id, gene_id, gene_id, cluster.start,
+                    cluster.end, cluster.strand)
 
     def merged_genes(self):
-        return [self._sql_row_to_gene(row) for row 
-                in self._cur.execute("SELECT * FROM genes")]
+        return [gene for row_id, gene in self._gene_store.genes()]
 
     def cleanup(self):
-        self._conn.close()
-        os.remove(self._tmp_db_file)
-
-    def _create_table(self):
-        try:
-            self._cur.execute(
-                "create table genes (row_id integer primary key, name text, "
-                "chrom text, strand text, start int, end int)")
-        except sqlite3.OperationalError:
-            os.remove(self._tmp_db_file)
+        self._gene_store.close()
 
     def _test_and_add(self, gene):
-        rows = list(self._cur.execute(
-                "SELECT * FROM genes WHERE chrom=? AND strand=? AND "
-                "start <= ? AND end >= ?",
-                (gene.seq_id, gene.strand, gene.end, gene.start)))
+        rows = self._gene_store.overlapping_genes(gene)
         if len(rows) == 0:
-            self._store_gene_in_db(gene)
+            self._gene_store.add(gene)
         else:
             # If the self._merge_genes is False the new gene is discarded
             if self._perform_gene_merging is False:
@@ -55,26 +110,26 @@ class GeneListMerger(object):
                 self._try_multi_gene_merge(gene, rows)
 
     def _try_multi_gene_merge(self, gene, rows):
-        overlapping_genes = [self._sql_row_to_gene(row) for row in rows]
         genes_to_merge = []
         rows_to_remove = []
-        for overlapping_gene, row in zip(overlapping_genes, rows):
+        for row in rows:
+            overlapping_gene = row[1]
             if not self._have_sufficient_overlap(
                 gene, overlapping_gene) is True:
                 continue
             genes_to_merge.append(overlapping_gene)
             rows_to_remove.append(row)
         for row in rows_to_remove:
-            self._remove_row(row)
+            self._gene_store.remove(row[0])
         start = min([gene.start] + [gene.start for gene in genes_to_merge])
         end = max([gene.end] + [gene.end for gene in genes_to_merge])
         gene_id = "_merged_with_".join(
             [gene.gene_id for gene in genes_to_merge] + [gene.gene_id])
-        self._store_gene_in_db(
+        self._gene_store.add(
             Gene(gene.seq_id, gene_id, gene_id, start, end, gene.strand))
 
     def _try_gene_merge(self, gene, row):
-        overlapping_gene = self._sql_row_to_gene(row)
+        overlapping_gene = row[1]
         if not self._have_sufficient_overlap(
             gene, overlapping_gene) is True:
             return
@@ -84,16 +139,10 @@ class GeneListMerger(object):
         end = max(gene.end, overlapping_gene.end)
         gene_id = "%s_merged_with_%s" % (
             overlapping_gene.gene_id, gene.gene_id)
-        self._remove_row(row)
-        self._store_gene_in_db(
+        self._gene_store.remove(row[0])
+        self._gene_store.add(
             Gene(gene.seq_id, gene_id, gene_id, start, end, gene.strand))
 
-    def _store_gene_in_db(self, gene):
-        self._cur.execute("INSERT INTO genes VALUES (NULL, ?, ?, ?, ?, ?)",
-                              (gene.gene_id, gene.seq_id, gene.strand, 
-                               gene.start, gene.end))
-        self._conn.commit()
-
     def _genes_are_identical(self, gene_1, gene_2):
         if (gene_1.gene_id == gene_2.gene_id and 
             gene_1.start == gene_2.end and
@@ -101,13 +150,6 @@ class GeneListMerger(object):
             return True
         return False
 
-    def _remove_row(self, row):
-        self._cur.execute("DELETE FROM genes WHERE row_id=%s" % (row[0]))
-        self._conn.commit()
-
-    def _sql_row_to_gene(self, row):
-        return Gene(row[2], row[1], row[1], row[4], row[5], row[3])
-
     def _have_sufficient_overlap(self, gene_1, gene_2):
         overlap = helpers.overlap(
             gene_1.start, gene_1.end, gene_2.start, gene_2.end)
@@ -136,3 +178,170 @@ class GeneListMerger(object):
         name = "_merged_with_".join([gene_1.name, gene_2.name])
         gene_id = "_merged_with_".join([gene_1.gene_id, gene_2.gene_id])
         return Gene(gene_1.seq_id, gene_id, name, start, end, gene_1.strand)
+
+class SQLiteGeneStore(object):
+    """Stores genes in a temporary SQLite table.
+
+    Rows are pairs of row id and gene. The genes are returned in the
+    order of their row ids.
+
+    The database is a uniquely named file in tmp_dir (default: the
+    system's temporary directory) so parallel jobs do not interfere.
+    An index on chromosome, strand and start position is used to find
+    overlapping genes. Changes are only committed when commit is
+    called (once per batch of genes).
+
+    """
+
+    def __init__(self, tmp_dir=None):
+        tmp_db_fh, self._tmp_db_file = tempfile.mkstemp(
+            suffix=".db", prefix="gene_list_merger_", dir=tmp_dir)
+        os.close(tmp_db_fh)
+        self._conn = sqlite3.connect(self._tmp_db_file)
+        self._cur = self._conn.cursor()
+        # This is a scratch database - no need for durability.
+        self._cur.execute("PRAGMA synchronous=OFF")
+        self._cur.execute("PRAGMA journal_mode=MEMORY")
+        self._chrom_strands_and_max_lengths = {}
+        self._create_table()
+
+    def overlapping_genes(self, gene):
+        """Return the rows of the genes on the same chromosome and
+        strand that overlap with the given gene.
+
+        Only genes that start within the longest gene length stored
+        for this chromosome and strand before the given gene can
+        overlap with it. This allows using the index for both
+        position conditions.
+
+        """
+        max_length = self._chrom_strands_and_max_lengths.get(
+            (gene.seq_id, gene.strand))
+        if max_length is None:
+            return []
+        return [(row[0], self._sql_row_to_gene(row)) for row in
+                self._cur.execute(
+                    "SELECT * FROM genes WHERE chrom=? AND strand=? AND "
+                    "start >= ? AND start <= ? AND end >= ? "
+                    "ORDER BY row_id",
+                    (gene.seq_id, gene.strand, gene.start - max_length,
+                     gene.end, gene.start))]
+
+    def add(self, gene):
+        self.add_many([gene])
+
+    def add_many(self, genes):
+        genes = list(genes)
+        for gene in genes:
+            chrom_strand = (gene.seq_id, gene.strand)
+            self._chrom_strands_and_max_lengths[chrom_strand] = max(
+                self._chrom_strands_and_max_lengths.get(chrom_strand, 0),
+                gene.end - gene.start)
+        self._cur.executemany(
+            "INSERT INTO genes VALUES (NULL, ?, ?, ?, ?, ?)",
+            [(gene.gene_id, gene.seq_id, gene.strand, gene.start, gene.end)
+             for gene in genes])
+
+    def remove(self, row_id):
+        self._cur.execute("DELETE FROM genes WHERE row_id=?", (row_id,))
+
+    def commit(self):
+        self._conn.commit()
+
+    def genes(self):
+        return [(row[0], self._sql_row_to_gene(row)) for row 
+                in self._cur.execute("SELECT * FROM genes ORDER BY row_id")]
+
+    def close(self):
+        self._conn.close()
+        os.remove(self._tmp_db_file)
+
+    def _create_table(self):
+        self._cur.execute(
+            "create table genes (row_id integer primary key, name text, "
+            "chrom text, strand text, start int, end int)")
+        self._cur.execute(
+            "create index genes_position on genes (chrom, strand, start, end)")
+
+    def _sql_row_to_gene(self, row):
+        return Gene(row[2], row[1], row[1], row[4], row[5], row[3])
+
+class MemoryGeneStore(object):
+    """Stores genes in memory.
+
+    For each chromosome and strand the genes are kept in a list
+    sorted by start position. Overlapping genes are found by binary
+    search: only genes that start between the query start minus the
+    longest gene length seen and the query end can overlap.
+
+    Row ids are assigned like for an SQLite integer primary key (the
+    maximal row id plus one) so that the genes are returned in the
+    same order as by SQLiteGeneStore.
+
+    """
+
+    def __init__(self):
+        self._chrom_strands_and_rows = {}
+        self._chrom_strands_and_max_lengths = {}
+        self._row_ids_and_rows = {}
+        # Negative row ids - for finding the maximal row id
+        self._row_id_heap = []
+
+    def overlapping_genes(self, gene):
+        chrom_strand = (gene.seq_id, gene.strand)
+        rows = self._chrom_strands_and_rows.get(chrom_strand)
+        if not rows:
+            return []
+        max_length = self._chrom_strands_and_max_lengths[chrom_strand]
+        first_index = bisect_left(rows, (gene.start - max_length,))
+        last_index = bisect_right(rows, (gene.end, float("inf")))
+        return sorted(
+            [(row_id, self._row_to_gene(row_id, chrom_strand, start, end))
+             for start, row_id, end in rows[first_index:last_index]
+             if end >= gene.start])
+
+    def add(self, gene):
+        # Skip the ids of removed rows
+        while (self._row_id_heap and
+               -self._row_id_heap[0] not in self._row_ids_and_rows):
+            heapq.heappop(self._row_id_heap)
+        row_id = 1
+        if self._row_id_heap:
+            row_id = -self._row_id_heap[0] + 1
+        heapq.heappush(self._row_id_heap, -row_id)
+        chrom_strand = (gene.seq_id, gene.strand)
+        row = (gene.start, row_id, gene.end)
+        insort(self._chrom_strands_and_rows.setdefault(chrom_strand, []), row)
+        self._chrom_strands_and_max_lengths[chrom_strand] = max(
+            self._chrom_strands_and_max_lengths.get(chrom_strand, 0),
+            gene.end - gene.start)
+        self._row_ids_and_rows[row_id] = (gene.gene_id, chrom_strand, row)
+
+    def remove(self, row_id):
+        gene_id, chrom_strand, row = self._row_ids_and_rows.pop(row_id)
+        rows = self._chrom_strands_and_rows[chrom_strand]
+        del rows[bisect_left(rows, row)]
+
+    def add_many(self, genes):
+        for gene in genes:
+            self.add(gene)
+
+    def commit(self):
+        pass
+
+    def genes(self):
+        return [(row_id, self._row_to_gene(
+                    row_id, chrom_strand, row[0], row[2]))
+                for row_id, (gene_id, chrom_strand, row)
+                in sorted(self._row_ids_and_rows.items())]
+
+    def close(self):
+        self._chrom_strands_and_rows = {}
+        self._chrom_strands_and_max_lengths = {}
+        self._row_ids_and_rows = {}
+        self._row_id_heap = []
+
+    def _row_to_gene(self, row_id, chrom_strand, start, end):
+        gene_id = self._row_ids_and_rows[row_id][0]
+        return Gene(chrom_strand[0], gene_id, gene_id, start, end,
+                    chrom_strand[1])
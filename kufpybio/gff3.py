@@ -1,4 +1,12 @@
+from array import array
 import csv
+from kufpybio.sidecarindex import SidecarIndex, SidecarIndexCache
+
+def _gff3_attributes(attributes_string):
+    """Translate a GFF3 attribute string to dictionary"""
+    return dict(
+        [key_value_pair.split("=")
+         for key_value_pair in attributes_string.split(";")])
 
 class Gff3Parser(object):
     """
@@ -13,6 +21,9 @@ class Gff3Parser(object):
     parse file not following the standard.
     """
 
+    def __init__(self):
+        self._gff_indices = SidecarIndexCache(Gff3Index)
+
     def entries(self, input_gff_fh):
         """
         """
@@ -24,10 +35,219 @@ class Gff3Parser(object):
                 continue
             yield self._dict_to_entry(entry_dict)
 
+    def fast_entries(self, input_gff_fh, features=None):
+        """Return light-weight entries (see Gff3Record)
+
+        The lines are split directly instead of using a DictReader.
+        If an iterable of feature names is given only lines of these
+        features are turned into entries. Reading stops at a ##FASTA
+        directive.
+
+        """
+        for row in self._rows(input_gff_fh, features):
+            yield self._row_to_record(row)
+
+    def columns(self, input_gff_fh, features=None):
+        """Return the main fields of the entries column-wise
+
+        Returns a dictionary with the keys "seq_id", "feature",
+        "start", "end" and "strand". The start and end values are
+        stored in integer arrays, the other ones in lists. The
+        features argument works like for fast_entries.
+
+        """
+        columns = {"seq_id" : [], "feature" : [], "start" : array("l"),
+                   "end" : array("l"), "strand" : []}
+        for row in self._rows(input_gff_fh, features):
+            start, end = int(row[3]), int(row[4])
+            if start > end:
+                start, end = end, start
+            columns["seq_id"].append(row[0])
+            columns["feature"].append(row[2])
+            columns["start"].append(start)
+            columns["end"].append(end)
+            columns["strand"].append(row[6])
+        return columns
+
+    def fetch(self, gff_file, seq_id, start=None, end=None):
+        """Return the entries of a replicon or region of a GFF file
+
+        Only the parts of the file that contain entries of the given
+        seq_id that overlap the region from start to end (both
+        inclusive, both optional) are read using a sidecar index (see
+        Gff3Index). The entries are returned as light-weight entries
+        (see fast_entries) in the order of the file.
+
+        """
+        gff_index = self._gff_indices.index(gff_file)
+        with open(gff_file, "rb") as gff_fh:
+            for offset, length in gff_index.chunks(seq_id, start, end):
+                gff_fh.seek(offset)
+                lines = gff_fh.read(length).decode("utf-8").splitlines()
+                for row in self._rows(lines, None):
+                    if row[0] != seq_id:
+                        continue
+                    record = self._row_to_record(row)
+                    if start is not None and record.end < start:
+                        continue
+                    if end is not None and record.start > end:
+                        continue
+                    yield record
+
+    def _rows(self, input_gff_fh, features):
+        if features is not None:
+            features = set(features)
+        for line in input_gff_fh:
+            if line.startswith("#"):
+                if line.startswith("##FASTA"):
+                    return
+                continue
+            row = line.rstrip("\r\n").split("\t")
+            if len(row) < 9:
+                continue
+            if features is not None and row[2] not in features:
+                continue
+            yield row
+
     def _dict_to_entry(self, entry_dict):
         return Gff3Entry(entry_dict)
 
-class Gff3Entry(object):
+    def _row_to_record(self, row):
+        return Gff3Record(row)
+
+class Gff3Index(SidecarIndex):
+    """A sidecar index for random access into GFF3/GTF files
+
+    The file is split into chunks of consecutive lines. For each chunk
+    and each seq_id found in it the byte offset and length of the
+    chunk and the minimal start and maximal end position of the
+    entries are stored (see SidecarIndex for how the index is stored
+    and kept up to date).
+
+    """
+
+    def __init__(self, gff_file, lines_per_chunk=1000):
+        SidecarIndex.__init__(self, gff_file)
+        self._lines_per_chunk = lines_per_chunk
+        self._seq_ids_and_chunks = {}
+
+    def _build_index(self):
+        self._seq_ids_and_chunks = {}
+        chunk_offset = 0
+        offset = 0
+        line_counter = 0
+        seq_ids_and_ranges = {}
+        with open(self._indexed_file, "rb") as gff_fh:
+            for line in gff_fh:
+                if line.startswith(b"##FASTA"):
+                    break
+                offset += len(line)
+                line_counter += 1
+                if not line.startswith(b"#"):
+                    row = line.split(b"\t", 5)
+                    if len(row) == 6:
+                        self._extend_range(seq_ids_and_ranges, row)
+                if line_counter == self._lines_per_chunk:
+                    self._add_chunk(seq_ids_and_ranges, chunk_offset,
+                                    offset - chunk_offset)
+                    chunk_offset = offset
+                    line_counter = 0
+                    seq_ids_and_ranges = {}
+        self._add_chunk(
+            seq_ids_and_ranges, chunk_offset, offset - chunk_offset)
+
+    def _index_data(self):
+        return {"seq_ids_and_chunks" : self._seq_ids_and_chunks}
+
+    def _set_index_data(self, index_data):
+        self._seq_ids_and_chunks = index_data["seq_ids_and_chunks"]
+
+    def chunks(self, seq_id, start=None, end=None):
+        """Return the byte offsets and lengths of the chunks that can
+        contain entries of the seq_id overlapping start to end.
+
+        """
+        return [(offset, length) for offset, length, min_start, max_end
+                in self._seq_ids_and_chunks.get(seq_id, [])
+                if (start is None or max_end >= start) and
+                (end is None or min_start <= end)]
+
+    def _extend_range(self, seq_ids_and_ranges, row):
+        seq_id = row[0].decode("utf-8")
+        start, end = sorted([int(row[3]), int(row[4])])
+        if seq_id not in seq_ids_and_ranges:
+            seq_ids_and_ranges[seq_id] = [start, end]
+            return
+        seq_id_range = seq_ids_and_ranges[seq_id]
+        seq_id_range[0] = min(seq_id_range[0], start)
+        seq_id_range[1] = max(seq_id_range[1], end)
+
+    def _add_chunk(self, seq_ids_and_ranges, offset, length):
+        for seq_id, (min_start, max_end) in seq_ids_and_ranges.items():
+            self._seq_ids_and_chunks.setdefault(seq_id, []).append(
+                [offset, length, min_start, max_end])
+
+class _Gff3EntryBase(object):
+    """The fields and methods shared by Gff3Entry and Gff3Record
+
+    The attribute string is translated to a dictionary only when the
+    attributes are accessed.
+
+    """
+
+    __slots__ = []
+    _attribute_separator = ";"
+    _key_value_separator = "="
+
+    @property
+    def attributes(self):
+        if self._attribute_dict is None:
+            self._attribute_dict = self._attributes(self.attribute_string)
+        return self._attribute_dict
+
+    @attributes.setter
+    def attributes(self, attribute_dict):
+        self._attribute_dict = attribute_dict
+
+    def _attributes(self, attributes_string):
+        """Translate the attribute string to dictionary"""
+        return _gff3_attributes(attributes_string)
+
+    def add_attribute(self, key, value):
+        self.attributes[key] = value
+        self.attribute_string = self._attribute_separator.join(
+            [self._key_value_separator.join(items)
+             for items in self.attributes.items()])
+
+    def __str__(self):
+        return "\t".join([str(field) for field in [
+                        self.seq_id, self.source, self.feature, self.start,
+                        self.end, self.score, self.strand, self.phase,
+                        self.attribute_string]])
+
+class Gff3Record(_Gff3EntryBase):
+    """A light-weight GFF3 entry
+
+    Created by Gff3Parser.fast_entries. It offers the same fields and
+    methods as Gff3Entry but uses __slots__.
+
+    """
+
+    __slots__ = ["seq_id", "source", "feature", "start", "end", "score",
+                 "strand", "phase", "attribute_string", "_attribute_dict"]
+
+    def __init__(self, row):
+        (self.seq_id, self.source, self.feature, start, end, self.score,
+         self.strand, self.phase, self.attribute_string) = row[:9]
+        # Make sure that start <= end
+        start, end = int(start), int(end)
+        if start > end:
+            start, end = end, start
+        self.start = start
+        self.end = end
+        self._attribute_dict = None
+
+class Gff3Entry(_Gff3EntryBase):
 
     """
 
@@ -57,22 +277,5 @@ class Gff3Entry(object):
         self.score = entry_dict["score"]
         self.strand = entry_dict["strand"]
         self.phase = entry_dict["phase"]
-        self.attributes = self._attributes(entry_dict["attributes"])
         self.attribute_string = entry_dict["attributes"]
-
-    def _attributes(self, attributes_string):
-        """Translate the attribute string to dictionary"""
-        return dict(
-            [key_value_pair.split("=")
-             for key_value_pair in attributes_string.split(";")])
-
-    def add_attribute(self, key, value):
-        self.attributes[key] = value
-        self.attribute_string = ";".join(
-            ["=".join(items) for items in self.attributes.items()])
-
-    def __str__(self):
-        return "\t".join([str(field) for field in [
-                        self.seq_id, self.source, self.feature, self.start,
-                        self.end, self.score, self.strand, self.phase,
-                        self.attribute_string]])
+        self._attribute_dict = None
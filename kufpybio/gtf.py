@@ -1,24 +1,34 @@
-from gff3 import Gff3Parser, Gff3Entry
+from kufpybio.gff3 import Gff3Parser, Gff3Entry, Gff3Record
 
 class GtfParser(Gff3Parser):
     
     def _dict_to_entry(self, entry_dict):
         return GtfEntry(entry_dict)
 
-class GtfEntry(Gff3Entry):
-    
-    def _strip(self, string):
-        return string.strip()
+    def _row_to_record(self, row):
+        return GtfRecord(row)
+
+def _gtf_attributes(attributes_string):
+    """Translate a GTF attribute string to dictionary"""
+    attributes_string = attributes_string.rstrip(";")
+    return dict(
+            [key_value_pair.strip().split(" ") 
+             for key_value_pair in attributes_string.split(";")])
+
+class _GtfAttributes(object):
+    """The GTF attribute format of GtfEntry and GtfRecord"""
+
+    __slots__ = []
+    _attribute_separator = "; "
+    _key_value_separator = " "
 
     def _attributes(self, attributes_string):
         """Translate the attribute string to dictionary"""
+        return _gtf_attributes(attributes_string)
+
+class GtfEntry(_GtfAttributes, Gff3Entry):
+    pass
 
-        attributes_string = attributes_string.rstrip(";")
-        return dict(
-                [self._strip(key_value_pair).split(" ") 
-                 for key_value_pair in attributes_string.split(";")])
+class GtfRecord(_GtfAttributes, Gff3Record):
 
-    def add_attribute(self, key, value):
-        self.attributes[key] = value
-        self.attribute_string = "; ".join(
-            [" ".join(items) for items in self.attributes.items()])
+    __slots__ = []
@@ -1,5 +1,30 @@
+import multiprocessing
+
 def overlap(start_1, end_1, start_2, end_2):
     result = min([end_1, end_2]) - max([start_1, start_2]) + 1
     if result >= 0:
         return result
     return 0
+
+def parallel_map(function, jobs, workers=1):
+    """Return an iterator over the results of the function for each
+    job in the order of the jobs.
+
+    With more than one worker and more than one job the jobs are run
+    in a pool of worker processes, so the function must be defined at
+    module level and jobs and results must be picklable. Otherwise
+    the jobs are run one after the other in this process.
+
+    """
+    jobs = list(jobs)
+    if workers < 2 or len(jobs) < 2:
+        for job in jobs:
+            yield function(job)
+        return
+    pool = multiprocessing.Pool(min(workers, len(jobs)))
+    try:
+        for result in pool.imap(function, jobs):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
@@ -1,49 +1,133 @@
+import numpy as np
+
 class IGRFinder(object):
+    """Find intergenic regions (IGRs)
+
+    By default the gene intervals are sorted and merged and the gaps
+    between them are returned. The run time depends only on the number
+    of genes, not on the length of the replicon.
+
+    With use_mask=True a boolean NumPy array with one value per
+    nucleotide (True = located in a gene) is built instead and the
+    IGRs are derived from its transitions. The mask of the last call
+    of find_igrs is kept as self.gene_mask and can be reused e.g. to
+    intersect it with coverages.
+
+    """
 
     # TODO 0- or 1-based
-    def __init__(self, coordinate_system_base=0):
+    def __init__(self, coordinate_system_base=0, use_mask=False):
         self.coordinate_system_base = coordinate_system_base
-        self._in_gene = "g"
-        self._in_irg = "i"
+        self.use_mask = use_mask
+        self.gene_mask = None
 
     def find_igrs(self, gene_list, element_length):
-        """ """
-        self._init_nucleotide_list(element_length)
-        self._mark_nucleotides_in_genes(gene_list)
-        self._determine_igr_positions()
+        """Return the (start, end) tuples of the IGRs of a replicon
+
+        gene_list - genes with the attributes start and end
+        element_length - length of the replicon
+
+        The positions from gene.start up to (but not including)
+        gene.end are considered genic. For each intergenic stretch of
+        positions from a to b (including a, excluding b) the tuple
+        (a + 1, b - 1) is returned.
+
+        """
+        if self.use_mask:
+            self.gene_mask = self.build_gene_mask(gene_list, element_length)
+            self.igr_positions = self._igr_positions_from_mask(
+                self.gene_mask)
+            return self.igr_positions
+        self.igr_positions = []
+        prev_gene_end = 0
+        for gene_start, gene_end in self._merged_gene_intervals(
+                gene_list, element_length):
+            if gene_start > prev_gene_end:
+                self.igr_positions.append((prev_gene_end + 1, gene_start - 1))
+            prev_gene_end = gene_end
+        if element_length > prev_gene_end:
+            self.igr_positions.append((prev_gene_end + 1, element_length - 1))
         return self.igr_positions
 
-    def _init_nucleotide_list(self, element_length):
-        """ Initiate the nucleotide list - for each position it is
-        assumed it is intergenic..
+    def find_igrs_per_strand(self, gene_list, element_length,
+                             strands=("+", "-")):
+        """Return a dictionary with the IGRs of each strand. Only the
+        genes of a strand are considered for its IGRs.
 
         """
-        self._nucleotides = [self._in_irg] * element_length
+        return dict([(strand, self.find_igrs(
+            [gene for gene in gene_list if gene.strand == strand],
+            element_length)) for strand in strands])
 
-    def _mark_nucleotides_in_genes(self, gene_list):
+    def find_igrs_per_replicon(self, gene_list, replicons_and_lengths,
+                               per_strand=False):
+        """Return a dictionary with the IGRs of each replicon
+
+        gene_list - genes with the attributes seq_id, start, end and
+                    strand
+        replicons_and_lengths - dictionary of replicon (seq_id) and
+                                replicon length
+        per_strand - If True the value for each replicon is the
+                     dictionary of find_igrs_per_strand.
+
+        """
+        replicons_and_genes = dict(
+            [(seq_id, []) for seq_id in replicons_and_lengths])
+        for gene in gene_list:
+            if gene.seq_id in replicons_and_genes:
+                replicons_and_genes[gene.seq_id].append(gene)
+        if per_strand:
+            find_igrs = self.find_igrs_per_strand
+        else:
+            find_igrs = self.find_igrs
+        return dict([(seq_id, find_igrs(
+            replicons_and_genes[seq_id], element_length))
+                     for seq_id, element_length
+                     in replicons_and_lengths.items()])
+
+    def build_gene_mask(self, gene_list, element_length):
+        """Return a boolean array of length element_length in which
+        the positions from gene.start up to (but not including)
+        gene.end of all genes are True.
+
+        """
+        gene_mask = np.zeros(element_length, dtype=bool)
+        self._mark_nucleotides_in_genes(gene_mask, gene_list)
+        return gene_mask
+
+    def _mark_nucleotides_in_genes(self, gene_mask, gene_list):
         """Mark the nucleotides that are located in genes."""
         for gene in gene_list:
-            self._nucleotides[gene.start:gene.end] = [self._in_gene] * (
-                gene.end - gene.start)
+            gene_mask[max(gene.start, 0):max(gene.end, 0)] = True
 
-    def _determine_igr_positions(self):
-        self.igr_positions = []
-        curr_igr_start = None
-        # If the nucleotide list starts with an IGR the start position
-        # needs to be set to 0. If this is not the case it will get a
-        # value later.
-        if self._nucleotides[0] == self._in_irg:
-            curr_igr_start = 0
-        prev_nucl_val = self._nucleotides[0]
-        for index, nucl_val in enumerate(self._nucleotides):
-            # Only transitions from IGR to gene and gene to IGR
-            # require an action.
-            if prev_nucl_val == self._in_irg and nucl_val == self._in_gene:
-                self.igr_positions.append((curr_igr_start+1, index-1))
-            elif prev_nucl_val == self._in_gene and nucl_val == self._in_irg:
-                curr_igr_start = index
-            elif prev_nucl_val == 0 and index == len(self._nucleotides-1):
-                self.igr_positions.append((0,index))
-            prev_nucl_val = nucl_val
-        if prev_nucl_val == self._in_irg:
-            self.igr_positions.append((curr_igr_start+1, len(self._nucleotides)-1))
+    def _igr_positions_from_mask(self, gene_mask):
+        """Return the IGR tuples by locating the borders of the
+        stretches of False values.
+
+        """
+        transitions = np.diff(np.concatenate(
+            ([0], (~gene_mask).view(np.int8), [0])))
+        igr_starts = np.flatnonzero(transitions == 1)
+        igr_ends = np.flatnonzero(transitions == -1)
+        return list(zip((igr_starts + 1).tolist(), (igr_ends - 1).tolist()))
+
+    def _merged_gene_intervals(self, gene_list, element_length):
+        """Return the sorted, non-overlapping and non-adjacent gene
+        intervals (start included, end excluded) inside of the
+        replicon.
+
+        """
+        gene_intervals = sorted([
+            (max(gene.start, 0), min(gene.end, element_length))
+            for gene in gene_list])
+        merged_gene_intervals = []
+        for gene_start, gene_end in gene_intervals:
+            if gene_start >= gene_end:
+                continue
+            if (merged_gene_intervals and
+                gene_start <= merged_gene_intervals[-1][1]):
+                merged_gene_intervals[-1][1] = max(
+                    merged_gene_intervals[-1][1], gene_end)
+            else:
+                merged_gene_intervals.append([gene_start, gene_end])
+        return merged_gene_intervals
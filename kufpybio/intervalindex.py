@@ -0,0 +1,51 @@
+from bisect import bisect_left, bisect_right
+
+class IntervalIndex(object):
+    """A static index for answering interval overlap queries.
+
+    The intervals are sorted by their start positions once. A query
+    for a window uses binary searches on the sorted start positions
+    and on the running maximum of the end positions to narrow down the
+    candidates. Each interval can carry an arbitrary item that is
+    returned for hits.
+
+    Example:
+    interval_index = IntervalIndex([(10, 100, "a"), (90, 200, "b")])
+    interval_index.overlapping(95, 98) # => ["a", "b"]
+
+    """
+
+    def __init__(self, intervals):
+        """
+        intervals - iterable of (start, end, item) tuples with
+                    start <= end
+
+        """
+        sorted_intervals = sorted(
+            intervals, key=lambda interval: (interval[0], interval[1]))
+        self._starts = [interval[0] for interval in sorted_intervals]
+        self._ends = [interval[1] for interval in sorted_intervals]
+        self._items = [interval[2] for interval in sorted_intervals]
+        self._max_ends = []
+        max_end = None
+        for end in self._ends:
+            if max_end is None or end > max_end:
+                max_end = end
+            self._max_ends.append(max_end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def overlapping(self, start, end):
+        """Return the items of all intervals that overlap with the
+        window start to end (both inclusive).
+
+        """
+        # Intervals starting behind the window end can't overlap ...
+        last_index = bisect_right(self._starts, end)
+        # ... and neither can the ones before the first interval that
+        # reaches the window start.
+        first_index = bisect_left(self._max_ends, start, 0, last_index)
+        return [self._items[index]
+                for index in range(first_index, last_index)
+                if self._ends[index] >= start]
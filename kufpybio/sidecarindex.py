@@ -0,0 +1,90 @@
+import json
+import os
+
+class SidecarIndex(object):
+    """Base class of sidecar indices for random access into files
+
+    The index is saved as JSON next to the indexed file (file name
+    plus ".idx") together with the size and modification time of the
+    indexed file so that outdated indices are detected.
+
+    Subclasses build the format-specific part of the index in
+    _build_index and return it as dictionary in _index_data. When an
+    index file is loaded this dictionary is given to
+    _set_index_data.
+
+    """
+
+    def __init__(self, indexed_file):
+        self._indexed_file = indexed_file
+        self._index_file = indexed_file + ".idx"
+        self._file_stats = None
+
+    def load_or_build(self):
+        """Load the index file or (re)build and save the index if the
+        index file does not exist or is outdated.
+
+        """
+        if os.path.exists(self._index_file):
+            with open(self._index_file) as index_fh:
+                index_data = json.load(index_fh)
+            file_stats = index_data.pop("file_stats")
+            if file_stats == self._current_file_stats():
+                self._file_stats = file_stats
+                self._set_index_data(index_data)
+                return
+        self.build()
+        self.save()
+
+    def build(self):
+        self._file_stats = self._current_file_stats()
+        self._build_index()
+
+    def save(self):
+        """Write the index file. If this is not possible (e.g. due to
+        missing permissions) the index is only kept in memory.
+
+        """
+        index_data = self._index_data()
+        index_data["file_stats"] = self._file_stats
+        try:
+            with open(self._index_file, "w") as index_fh:
+                json.dump(index_data, index_fh)
+        except (IOError, OSError):
+            pass
+
+    def is_up_to_date(self):
+        return self._file_stats == self._current_file_stats()
+
+    def _build_index(self):
+        raise NotImplementedError
+
+    def _index_data(self):
+        raise NotImplementedError
+
+    def _set_index_data(self, index_data):
+        raise NotImplementedError
+
+    def _current_file_stats(self):
+        file_stat = os.stat(self._indexed_file)
+        return [file_stat.st_size, file_stat.st_mtime]
+
+class SidecarIndexCache(object):
+    """Keeps the sidecar indices of the files a parser fetches from
+
+    The index of a file is loaded (or built) when it is requested the
+    first time and again when the file was changed since.
+
+    """
+
+    def __init__(self, index_class):
+        self._index_class = index_class
+        self._files_and_indices = {}
+
+    def index(self, indexed_file):
+        index = self._files_and_indices.get(indexed_file)
+        if index is None or not index.is_up_to_date():
+            index = self._index_class(indexed_file)
+            index.load_or_build()
+            self._files_and_indices[indexed_file] = index
+        return index
@@ -1,5 +1,12 @@
 """Classes for associating TSS and genes."""
 
+from array import array
+from collections import deque
+import itertools
+import numpy as np
+from kufpybio.helpers import parallel_map
+from kufpybio.intervalindex import IntervalIndex
+
 # Some commonly used strings:
 # Strand
 plus_str = "+"
@@ -14,6 +21,10 @@ antisense_str = "antisense"
 loc_5_prime_str = "5' region"
 loc_internal_str = "internal"
 loc_antisense_str = "antisense"
+# Integer codes of locations and TSS types used by TSSGeneAssociations
+# are the positions in this list.
+feature_strs = [orphan_str, loc_5_prime_str, loc_internal_str,
+                loc_antisense_str, primary_str, secondary_str]
 
 class TSSGeneMapper(object):
     """Find the associated genes for TSS (Transcription start sites).
@@ -43,6 +54,10 @@ class TSSGeneMapper(object):
     is in closest proximity to the gene is the primary TSS, the
     remaining ones are considered as secondary TSS.
 
+    TSS are only associated with genes located on the same replicon
+    (same seq_id). TSS without a seq_id (None) can be associated with
+    genes on any replicon.
+
     """
 
     def __init__(self, max_dist_5_prime=300, max_dist_antisense=100):
@@ -58,7 +73,7 @@ class TSSGeneMapper(object):
         self._max_dist_5_prime = max_dist_5_prime
         self._max_dist_antisense = max_dist_antisense
 
-    def map_tss(self, tss_list, gene_list):
+    def map_tss(self, tss_list, gene_list, workers=1):
         """Perform the TSS to gene mapping 
 
         Returns a list of TSS, their associated genes, and the type of TSS.
@@ -74,28 +89,363 @@ class TSSGeneMapper(object):
           - gene.start 
           - gene.end
           - gene.strand
+        - workers: number of processes. With more than one worker
+          the replicons are mapped concurrently.
           
         For both, plus and minus strand entries, it is assummed that
         gene.start < gene.end.
 
-        A comment regarding performance: The searches are not
-        optimized for speed - every gene is checked.
+        A comment regarding performance: The TSS and genes are split
+        by replicon. In each replicon the genes are stored in one
+        interval index per strand. For each TSS only the genes that
+        overlap with the 5'/internal window (same strand) or the
+        antisense window (other strands) are checked. The candidates
+        are checked in the order of the gene list so the result is
+        the same as when checking every gene. Independent of the
+        number of workers the TSS are returned in the order of the
+        TSS list.
+
+        """
+        partitions = self._replicon_partitions(tss_list, gene_list)
+        tss_and_hit_genes = {}
+        partition_jobs = [
+            (self._max_dist_5_prime, self._max_dist_antisense,
+             partition_tss_list, partition_gene_list)
+            for partition_tss_list, partition_gene_list in partitions]
+        for (partition_tss_list, partition_gene_list), hit_genes_list in (
+                zip(partitions, parallel_map(
+                    _map_tss_partition, partition_jobs, workers))):
+            for tss, gene_positions_and_features in zip(
+                    partition_tss_list, hit_genes_list):
+                tss_and_hit_genes[tss] = dict([
+                    (gene_position if gene_position == orphan_str
+                     else partition_gene_list[gene_position], features)
+                    for gene_position, features
+                    in gene_positions_and_features])
+        self.tss_and_hit_genes = dict(
+            [(tss, tss_and_hit_genes[tss]) for tss in tss_list])
+        return self.tss_and_hit_genes
+
+    def map_tss_compact(self, tss_list, gene_list, workers=1):
+        """Perform the TSS to gene mapping with a compact result
+
+        Same as map_tss but the associations are returned as
+        TSSGeneAssociations table. No dictionary is created per
+        association which reduces the memory consumption a lot for
+        large numbers of associations.
+
+        """
+        associations = TSSGeneAssociations(tss_list, gene_list)
+        partitions = self._replicon_partition_positions(tss_list, gene_list)
+        partition_lists = [
+            ([tss_list[tss_position] for tss_position in tss_positions],
+             [gene_list[gene_position] for gene_position in gene_positions])
+            for tss_positions, gene_positions in partitions]
+        partition_jobs = [
+            (self._max_dist_5_prime, self._max_dist_antisense,
+             partition_tss_list, partition_gene_list)
+            for partition_tss_list, partition_gene_list in partition_lists]
+        for (tss_positions, gene_positions), columns in zip(
+                partitions, parallel_map(
+                    _map_tss_partition_compact, partition_jobs, workers)):
+            associations.extend(columns, tss_positions, gene_positions)
+        associations.sort_by_tss()
+        return associations
+
+    def _map_partition_compact(self, tss_list, gene_list):
+        associations = TSSGeneAssociations(tss_list, gene_list)
+        gene_indices = self._build_gene_indices(gene_list)
+        for tss_index, tss in enumerate(tss_list):
+            is_orphan = True
+            for gene_index in self._candidate_gene_indices(
+                    tss, gene_indices):
+                association = self._tss_gene_association(
+                    tss, gene_list[gene_index])
+                if association is None:
+                    continue
+                is_orphan = False
+                location, distance = association
+                location_code = feature_strs.index(location)
+                if distance is None:
+                    distance = -1
+                associations.append(tss_index, gene_index, location_code,
+                                    location_code, distance)
+            if is_orphan:
+                associations.append(tss_index, -1, 0, 0, -1)
+        self._set_type_of_5_prime_rows(associations)
+        self._remove_multiple_association_rows(associations)
+        return associations
+
+    def _set_type_of_5_prime_rows(self, associations):
+        """Set the type of the 5' associations of a table.
+
+        The rows are sorted by gene, distance and row number. The
+        first row of each gene is the primary one.
 
         """
+        loc_5_prime_rows = np.flatnonzero(
+            associations.numpy_column("locations") ==
+            feature_strs.index(loc_5_prime_str))
+        gene_indices = associations.numpy_column(
+            "gene_indices")[loc_5_prime_rows]
+        distances = associations.numpy_column("distances")[loc_5_prime_rows]
+        order = np.lexsort((loc_5_prime_rows, distances, gene_indices))
+        sorted_gene_indices = gene_indices[order]
+        is_primary = np.ones(len(order), dtype=bool)
+        is_primary[1:] = sorted_gene_indices[1:] != sorted_gene_indices[:-1]
+        tss_types = associations.numpy_column("tss_types")
+        tss_types[loc_5_prime_rows] = feature_strs.index(secondary_str)
+        tss_types[loc_5_prime_rows[order[is_primary]]] = feature_strs.index(
+            primary_str)
+
+    def _remove_multiple_association_rows(self, associations):
+        """Remove multple 5' associations from an association table.
+
+        See _remove_multiple_associations. To get exactly the same
+        result as there, a 5' association with a distance of 0 is
+        replaced by the next 5' association of the TSS. So the closest
+        association is the first one with the minimal distance after
+        the last association with a distance of 0 - or this last one
+        if there is no 5' association behind it.
+
+        """
+        row_number = len(associations)
+        if row_number == 0:
+            return
+        rows = np.arange(row_number)
+        tss_indices = associations.numpy_column("tss_indices")
+        distances = associations.numpy_column("distances")
+        is_loc_5_prime = (associations.numpy_column("locations") ==
+                          feature_strs.index(loc_5_prime_str))
+        # The rows of a TSS follow each other - number these groups.
+        is_group_start = np.ones(row_number, dtype=bool)
+        is_group_start[1:] = tss_indices[1:] != tss_indices[:-1]
+        groups = np.cumsum(is_group_start) - 1
+        group_sizes = np.bincount(groups)
+        last_zero_rows = np.full(len(group_sizes), -1)
+        zero_rows = rows[is_loc_5_prime & (distances == 0)]
+        np.maximum.at(last_zero_rows, groups[zero_rows], zero_rows)
+        candidate_rows = rows[
+            is_loc_5_prime & (rows > last_zero_rows[groups])]
+        closest_rows = last_zero_rows
+        order = np.lexsort((candidate_rows, distances[candidate_rows],
+                            groups[candidate_rows]))
+        sorted_candidate_rows = candidate_rows[order]
+        sorted_groups = groups[sorted_candidate_rows]
+        is_closest = np.ones(len(order), dtype=bool)
+        is_closest[1:] = sorted_groups[1:] != sorted_groups[:-1]
+        closest_rows[sorted_groups[is_closest]] = sorted_candidate_rows[
+            is_closest]
+        rows_to_keep = rows[
+            ~is_loc_5_prime | (group_sizes[groups] == 1) |
+            (rows == closest_rows[groups])]
+        associations.select_rows(rows_to_keep)
+
+    def _replicon_partitions(self, tss_list, gene_list):
+        """Split the TSS and genes into pairs of lists per replicon."""
+        return [
+            ([tss_list[tss_position] for tss_position in tss_positions],
+             [gene_list[gene_position] for gene_position in gene_positions])
+            for tss_positions, gene_positions
+            in self._replicon_partition_positions(tss_list, gene_list)]
+
+    def _replicon_partition_positions(self, tss_list, gene_list):
+        """Split the TSS and genes by replicon.
+
+        Returns pairs of lists of TSS list and gene list positions. If
+        any of the TSS has no seq_id all TSS and genes end up in a
+        single partition.
+
+        """
+        if any([tss.seq_id is None for tss in tss_list]):
+            return [(list(range(len(tss_list))), list(range(len(gene_list))))]
+        replicons_and_tss_positions = {}
+        replicons_and_gene_positions = {}
+        for tss_position, tss in enumerate(tss_list):
+            replicons_and_tss_positions.setdefault(
+                tss.seq_id, []).append(tss_position)
+        for gene_position, gene in enumerate(gene_list):
+            replicons_and_gene_positions.setdefault(
+                gene.seq_id, []).append(gene_position)
+        return [(tss_positions, replicons_and_gene_positions.get(seq_id, []))
+                for seq_id, tss_positions
+                in replicons_and_tss_positions.items()]
+
+    def _map_partition(self, tss_list, gene_list):
         self.tss_and_hit_genes = {}
         self.genes_and_5_prime_tss = {}
-        gene_list = gene_list
+        gene_indices = self._build_gene_indices(gene_list)
         for tss in tss_list:
-            for gene in gene_list:
-                self._check_tss_gene_associations(tss, gene)
+            for gene_index in self._candidate_gene_indices(
+                    tss, gene_indices):
+                self._check_tss_gene_associations(
+                    tss, gene_list[gene_index])
             if tss not in self.tss_and_hit_genes:
-                self.tss_and_hit_genes[tss] = {orphan_str : {
-                        'distance': None, 'location': orphan_str, 
-                        'tss_type': orphan_str}}
+                self.tss_and_hit_genes[tss] = self._orphan_hit_genes()
         self._set_type_of_5_prime_tss()
         self._remove_multiple_associations()
         return self.tss_and_hit_genes
 
+    def map_sorted_tss(self, tss_list, gene_list):
+        """Perform the TSS to gene mapping for position sorted input
+
+        This is a streaming version of map_tss. It yields the TSS and
+        their associated genes (as pairs of TSS and the dictionary
+        that map_tss would return for this TSS) in the order of the
+        TSS input.
+
+        Arguments:
+        - tss_list: an iterable of TSS. The TSS of a replicon must
+          follow each other and be sorted by tss.pos.
+        - gene_list: an iterable of genes (in any order)
+
+        The TSS input is walked only once. Only the genes that are in
+        reach of the current TSS and the TSS of the last
+        max_dist_5_prime positions are kept in memory. A TSS is
+        yielded as soon as no further TSS could change the
+        primary/secondary classification of its 5' associations. A
+        ValueError is raised if the TSS of a replicon are not sorted
+        or do not follow each other.
+
+        """
+        replicons_and_genes = {}
+        for gene in gene_list:
+            replicons_and_genes.setdefault(gene.seq_id, []).append(gene)
+        for replicon_gene_list in replicons_and_genes.values():
+            replicon_gene_list.sort(key=lambda gene: gene.start)
+        seen_seq_ids = set()
+        for seq_id, replicon_tss_list in itertools.groupby(
+                tss_list, key=lambda tss: tss.seq_id):
+            if seq_id in seen_seq_ids:
+                raise ValueError(
+                    "The TSS of replicon \"%s\" do not follow each "
+                    "other." % seq_id)
+            seen_seq_ids.add(seq_id)
+            if seq_id is None:
+                replicon_gene_list = sorted(
+                    [gene for genes in replicons_and_genes.values()
+                     for gene in genes], key=lambda gene: gene.start)
+            else:
+                replicon_gene_list = replicons_and_genes.get(seq_id, [])
+            for tss_and_hit_genes in self._sweep(
+                    replicon_tss_list, replicon_gene_list):
+                yield tss_and_hit_genes
+
+    def _sweep(self, tss_list, gene_list):
+        max_dist = max(self._max_dist_5_prime, self._max_dist_antisense)
+        genes = iter(gene_list)
+        next_gene = next(genes, None)
+        active_genes = []
+        # TSS (with their hit genes) that are not yielded yet
+        pending_tss_and_hit_genes = deque()
+        self.genes_and_5_prime_tss = {}
+        self._genes_and_primary_tss = {}
+        prev_pos = None
+        for tss in tss_list:
+            if prev_pos is not None and tss.pos < prev_pos:
+                raise ValueError(
+                    "TSS are not sorted by position (%s after %s in %s)." % (
+                        tss.pos, prev_pos, tss.seq_id))
+            prev_pos = tss.pos
+            while (pending_tss_and_hit_genes and
+                   pending_tss_and_hit_genes[0][0].pos <
+                   tss.pos - self._max_dist_5_prime):
+                yield self._finalize_hit_genes(
+                    *pending_tss_and_hit_genes.popleft())
+            while (next_gene is not None and
+                   next_gene.start <= tss.pos + max_dist):
+                active_genes.append(next_gene)
+                next_gene = next(genes, None)
+            active_genes = [gene for gene in active_genes
+                            if gene.end >= tss.pos - max_dist]
+            hit_genes = {}
+            for gene in active_genes:
+                association = self._tss_gene_association(tss, gene)
+                if association is None:
+                    continue
+                location, distance = association
+                hit_genes[gene] = {
+                    "location" : location, "distance" : distance,
+                    "tss_type" : location}
+                if type(distance) == int:
+                    self.genes_and_5_prime_tss.setdefault(gene, [])
+                    self.genes_and_5_prime_tss[gene].append([distance, tss])
+            if len(hit_genes) == 0:
+                hit_genes = self._orphan_hit_genes()
+            pending_tss_and_hit_genes.append((tss, hit_genes))
+        while pending_tss_and_hit_genes:
+            yield self._finalize_hit_genes(
+                *pending_tss_and_hit_genes.popleft())
+
+    def _finalize_hit_genes(self, tss, hit_genes):
+        """Set the type of the 5' associations of a TSS and remove
+        multiple associations.
+
+        When this is called all 5' TSS of the associated genes are
+        known.
+
+        """
+        for gene, tss_features in hit_genes.items():
+            if tss_features["location"] != loc_5_prime_str:
+                continue
+            if gene not in self._genes_and_primary_tss:
+                distances_and_tss = self.genes_and_5_prime_tss.pop(gene)
+                min_distance = min(
+                    [distance for distance, tss_ in distances_and_tss])
+                primary_tss = [
+                    tss_ for distance, tss_ in distances_and_tss
+                    if distance == min_distance][0]
+                self._genes_and_primary_tss[gene] = [
+                    primary_tss, len(distances_and_tss)]
+            primary_tss_and_counter = self._genes_and_primary_tss[gene]
+            if primary_tss_and_counter[0] is tss:
+                tss_features["tss_type"] = primary_str
+            else:
+                tss_features["tss_type"] = secondary_str
+            # Forget the gene as soon as all its 5' TSS are processed.
+            primary_tss_and_counter[1] -= 1
+            if primary_tss_and_counter[1] == 0:
+                self._genes_and_primary_tss.pop(gene)
+        return tss, self._filtered_hit_genes(hit_genes)
+
+    def _orphan_hit_genes(self):
+        return {orphan_str : {
+                'distance': None, 'location': orphan_str,
+                'tss_type': orphan_str}}
+
+    def _build_gene_indices(self, gene_list):
+        """Build an interval index of the gene list positions for each
+        strand.
+
+        """
+        strands_and_intervals = {}
+        for gene_index, gene in enumerate(gene_list):
+            strands_and_intervals.setdefault(gene.strand, []).append(
+                (gene.start, gene.end, gene_index))
+        return dict([(strand, IntervalIndex(intervals))
+                     for strand, intervals in strands_and_intervals.items()])
+
+    def _candidate_gene_indices(self, tss, gene_indices):
+        """Return the sorted gene list positions of all genes that
+        could be associated with the TSS.
+
+        A gene on the same strand can only be 5' or internal
+        associated if it overlaps the range of max_dist_5_prime around
+        the TSS. A gene on another strand can only be antisense
+        associated if it overlaps the range of max_dist_antisense
+        around the TSS.
+
+        """
+        candidate_gene_indices = []
+        for strand, gene_index in gene_indices.items():
+            if strand == tss.strand:
+                max_dist = self._max_dist_5_prime
+            else:
+                max_dist = self._max_dist_antisense
+            candidate_gene_indices.extend(gene_index.overlapping(
+                tss.pos - max_dist, tss.pos + max_dist))
+        return sorted(candidate_gene_indices)
+
     def _set_type_of_5_prime_tss(self):
         for gene, distances_and_tss in self.genes_and_5_prime_tss.items():
             distance_sorted_tss = [
@@ -108,16 +458,9 @@ class TSSGeneMapper(object):
                         gene]["tss_type"] = secondary_str
 
     def _check_tss_gene_associations(self, tss, gene):
-        location = None
-        distance = None
-        if self._has_5_prime_association(tss, gene):
-            location = loc_5_prime_str
-            distance = self._5_prime_dist(tss, gene)
-        elif self._has_internal_association(tss, gene):
-            location = loc_internal_str
-        elif self._has_antisense_association(tss, gene):
-            location = loc_antisense_str
-        if not location is None:
+        association = self._tss_gene_association(tss, gene)
+        if not association is None:
+            location, distance = association
             self.tss_and_hit_genes.setdefault(tss, {})
             self.tss_and_hit_genes[tss][gene] = {
                 "location" : location, "distance" : distance, 
@@ -129,6 +472,20 @@ class TSSGeneMapper(object):
                 self.genes_and_5_prime_tss.setdefault(gene, [])
                 self.genes_and_5_prime_tss[gene].append([distance, tss])
             
+    def _tss_gene_association(self, tss, gene):
+        """Return the location and the 5' distance of a TSS-gene
+        association or None if they are not associated.
+
+        """
+        if not tss.seq_id is None and tss.seq_id != gene.seq_id:
+            return
+        if self._has_5_prime_association(tss, gene):
+            return loc_5_prime_str, self._5_prime_dist(tss, gene)
+        elif self._has_internal_association(tss, gene):
+            return loc_internal_str, None
+        elif self._has_antisense_association(tss, gene):
+            return loc_antisense_str, None
+
     def _has_5_prime_association(self, tss, gene):
         """Test for 5' prime association
 
@@ -189,22 +546,182 @@ class TSSGeneMapper(object):
 
         """
         for tss, hit_genes in self.tss_and_hit_genes.items():
-            if len(hit_genes) == 1 or hit_genes == orphan_str:
-                continue
-            min_dist = None
-            closest_gene = None
-            filtered_hit_genes = {}
-            for hit_gene in hit_genes.keys():
-                if hit_genes[hit_gene]["location"] == loc_5_prime_str:
-                    if (not min_dist) or (
-                        hit_genes[hit_gene]["distance"] < min_dist):
-                        closest_gene = hit_gene
-                        min_dist = hit_genes[hit_gene]["distance"]
-                else:
-                    filtered_hit_genes[hit_gene] = hit_genes[hit_gene]
-            if closest_gene:
-                filtered_hit_genes[closest_gene] = hit_genes[closest_gene]
-            self.tss_and_hit_genes[tss] = filtered_hit_genes
+            self.tss_and_hit_genes[tss] = self._filtered_hit_genes(hit_genes)
+
+    def _filtered_hit_genes(self, hit_genes):
+        """Return the hit genes of a TSS with only the closest 5'
+        associated gene.
+
+        """
+        if len(hit_genes) == 1 or hit_genes == orphan_str:
+            return hit_genes
+        min_dist = None
+        closest_gene = None
+        filtered_hit_genes = {}
+        for hit_gene in hit_genes.keys():
+            if hit_genes[hit_gene]["location"] == loc_5_prime_str:
+                if (not min_dist) or (
+                    hit_genes[hit_gene]["distance"] < min_dist):
+                    closest_gene = hit_gene
+                    min_dist = hit_genes[hit_gene]["distance"]
+            else:
+                filtered_hit_genes[hit_gene] = hit_genes[hit_gene]
+        if closest_gene:
+            filtered_hit_genes[closest_gene] = hit_genes[closest_gene]
+        return filtered_hit_genes
+
+def _map_tss_partition(max_dists_and_partition):
+    """Map the TSS and genes of a partition (run by parallel_map).
+
+    The genes are returned as positions in the gene list as the
+    objects in a worker process are copies of the original ones.
+
+    """
+    (max_dist_5_prime, max_dist_antisense, tss_list,
+     gene_list) = max_dists_and_partition
+    tss_and_hit_genes = TSSGeneMapper(
+        max_dist_5_prime, max_dist_antisense)._map_partition(
+            tss_list, gene_list)
+    gene_positions = dict([(gene, gene_position) for gene_position, gene
+                           in enumerate(gene_list)])
+    gene_positions[orphan_str] = orphan_str
+    return [[(gene_positions[gene], features)
+             for gene, features in tss_and_hit_genes[tss].items()]
+            for tss in tss_list]
+
+def _map_tss_partition_compact(max_dists_and_partition):
+    """Map the TSS and genes of a partition (run by parallel_map) and
+    return the columns of the association table.
+
+    """
+    (max_dist_5_prime, max_dist_antisense, tss_list,
+     gene_list) = max_dists_and_partition
+    return TSSGeneMapper(
+        max_dist_5_prime, max_dist_antisense)._map_partition_compact(
+            tss_list, gene_list).columns()
+
+class TSSGeneAssociations(object):
+    """A compact table of TSS-gene associations
+
+    Each association is a row. The values are stored column wise in
+    typed arrays:
+    - tss_indices: position of the TSS in the TSS list
+    - gene_indices: position of the gene in the gene list (-1 for
+      orphan TSS)
+    - locations: location code (position in feature_strs)
+    - tss_types: TSS type code (position in feature_strs)
+    - distances: 5' distance (-1 if not 5' associated)
+
+    The rows of a TSS follow each other. Orphan TSS have a single row
+    with the location and TSS type code of orphan_str.
+
+    """
+
+    column_names = [
+        "tss_indices", "gene_indices", "locations", "tss_types", "distances"]
+    column_typecodes = ["i", "i", "b", "b", "i"]
+
+    def __init__(self, tss_list, gene_list):
+        self.tss_list = tss_list
+        self.gene_list = gene_list
+        for column_name, typecode in zip(
+                self.column_names, self.column_typecodes):
+            setattr(self, column_name, array(typecode))
+
+    def __len__(self):
+        return len(self.tss_indices)
+
+    def append(self, tss_index, gene_index, location, tss_type, distance):
+        self.tss_indices.append(tss_index)
+        self.gene_indices.append(gene_index)
+        self.locations.append(location)
+        self.tss_types.append(tss_type)
+        self.distances.append(distance)
+
+    def columns(self):
+        return [getattr(self, column_name)
+                for column_name in self.column_names]
+
+    def extend(self, columns, tss_positions, gene_positions):
+        """Add the rows of a partition table.
+
+        The TSS and gene indices of the partition are translated with
+        the given lists of TSS and gene positions.
+
+        """
+        (tss_indices, gene_indices, locations, tss_types,
+         distances) = columns
+        self.tss_indices.extend(
+            [tss_positions[tss_index] for tss_index in tss_indices])
+        self.gene_indices.extend(
+            [gene_index if gene_index == -1 else gene_positions[gene_index]
+             for gene_index in gene_indices])
+        self.locations.extend(locations)
+        self.tss_types.extend(tss_types)
+        self.distances.extend(distances)
+
+    def numpy_column(self, column_name):
+        """Return a NumPy view of a column.
+
+        Changes of the view values change the table. The view must be
+        released before rows are added or removed.
+
+        """
+        column = getattr(self, column_name)
+        return np.frombuffer(column, dtype=column.typecode)
+
+    def select_rows(self, rows):
+        """Keep only the given rows (in the given order)."""
+        rows = np.asarray(rows, dtype=np.intp)
+        for column_name, typecode in zip(
+                self.column_names, self.column_typecodes):
+            selected_column = array(typecode)
+            if len(self) > 0:
+                selected_column.frombytes(
+                    self.numpy_column(column_name)[rows].tobytes())
+            setattr(self, column_name, selected_column)
+
+    def sort_by_tss(self):
+        """Order the rows like the TSS list."""
+        if len(self) == 0:
+            return
+        self.select_rows(np.argsort(
+            self.numpy_column("tss_indices"), kind="stable"))
+
+    def tss(self, row):
+        return self.tss_list[self.tss_indices[row]]
+
+    def gene(self, row):
+        """Return the gene of a row or None for orphan TSS."""
+        gene_index = self.gene_indices[row]
+        if gene_index == -1:
+            return None
+        return self.gene_list[gene_index]
+
+    def location(self, row):
+        return feature_strs[self.locations[row]]
+
+    def tss_type(self, row):
+        return feature_strs[self.tss_types[row]]
+
+    def distance(self, row):
+        distance = self.distances[row]
+        if distance == -1:
+            return None
+        return distance
+
+    def tss_and_hit_genes(self):
+        """Return the associations in the format of TSSGeneMapper.map_tss"""
+        tss_and_hit_genes = {}
+        for row in range(len(self)):
+            gene = self.gene(row)
+            if gene is None:
+                gene = orphan_str
+            tss_and_hit_genes.setdefault(self.tss(row), {})[gene] = {
+                "location" : self.location(row),
+                "distance" : self.distance(row),
+                "tss_type" : self.tss_type(row)}
+        return tss_and_hit_genes
 
 class TSSGeneFormatter(object):
 
@@ -233,6 +750,24 @@ class TSSGeneFormatter(object):
         elif (tss_features["location"] == loc_antisense_str):
             return ["0", "0", "0", "1"]
 
+    def association_binary_format(self, associations, row):
+        """Returns the binary format of a row of a TSSGeneAssociations
+        table.
+
+        """
+        return self.tss_features_binary_format(
+            self._association_features(associations, row))
+
+    def association_string(self, associations, row):
+        return self.tss_features_string(
+            self._association_features(associations, row))
+
+    def _association_features(self, associations, row):
+        if associations.gene_indices[row] == -1:
+            return orphan_str
+        return {"location" : associations.location(row),
+                "tss_type" : associations.tss_type(row)}
+
     def tss_features_string(self, tss_features):
         if tss_features == orphan_str:
             return orphan_str
@@ -1,39 +1,259 @@
+from array import array
 import csv
+import json
+import os
+import struct
+import warnings
+import zlib
+import numpy as np
+from kufpybio.sidecarindex import SidecarIndex, SidecarIndexCache
+
+# Beginnings of the lines that are not data lines
+_header_line_prefixes = ("track", "variableStep", "fixedStep", "browser", "#")
+_binary_header_line_prefixes = tuple(
+    [prefix.encode("ascii") for prefix in _header_line_prefixes])
+
+def _span_start(start, span):
+    """Return the smallest position whose value can overlap start. A
+    value covers its position and the following span - 1 positions.
 
-class WiggleParser(object):
     """
+    if start is None:
+        return None
+    return start - span + 1
 
-    Warning - this does not implement the full specification!
+def _region_entry(track_name, replicon, span, step, block_start,
+                  position_arrays, value_arrays, start, end):
+    """Concatenate the arrays of positions and values and return a
+    WiggleEntry of the positions from start (see _span_start) to end
+    (both optional). For fixedStep entries (step is not None) the
+    start is the first remaining position or block_start if no
+    position remains.
 
     """
+    positions = np.concatenate(
+        [np.zeros(0, dtype=np.int64)] + position_arrays)
+    values = np.concatenate([np.zeros(0)] + value_arrays)
+    in_region = np.ones(len(positions), dtype=bool)
+    if start is not None:
+        in_region &= positions >= start
+    if end is not None:
+        in_region &= positions <= end
+    if step is not None:
+        values = values[in_region]
+        if len(values) > 0:
+            block_start = int(positions[in_region][0])
+        return WiggleEntry(track_name, replicon, span, values=values,
+                           start=block_start, step=step)
+    return WiggleEntry(track_name, replicon, span,
+                       positions=positions[in_region],
+                       values=values[in_region])
+
+class WiggleParser(object):
+    """Parse wiggle files
+
+    variableStep and fixedStep blocks (including their span) are
+    supported. Each block is returned as WiggleEntry. The values of
+    fixedStep blocks are stored without expanding their positions.
+
+    """
+
+    def __init__(self):
+        self._wiggle_indices = SidecarIndexCache(WiggleIndex)
 
     def entries(self, input_fh):
         track_name = None
-        replicon = None
-        span = None
-        pos_value_pairs = []
+        block_track_name = None
+        header = None
+        positions = array("q")
+        values = array("d")
         for line in input_fh:
-            row = line[:-1].split()
-            if len(row) == 0:
+            row = line.split()
+            if len(row) == 0 or row[0].startswith("#") or row[0] == "browser":
                 continue
             if row[0].startswith("track"):
                 track_name = self._track_name(row)
-            elif row[0].startswith("variableStep"):
-                if replicon:
-                    prev_replicon = replicon
-                    prev_span = span
-                    prev_pos_value_pairs = pos_value_pairs
-                    replicon = self._replicon(row)
-                    span = None
-                    pos_value_pairs = []
-                    yield WiggleEntry(
-                            track_name, prev_replicon, prev_span, 
-                            prev_pos_value_pairs)
-                else:
-                    replicon = self._replicon(row)
+            elif row[0] in ("variableStep", "fixedStep"):
+                if header is not None:
+                    yield self._entry(
+                        block_track_name, header, positions, values)
+                    positions = array("q")
+                    values = array("d")
+                header = self._block_header(row)
+                block_track_name = track_name
+            elif header is not None and header["step"] is not None:
+                values.append(float(row[0]))
+            else:
+                positions.append(int(row[0]))
+                values.append(float(row[1]))
+        if header is None:
+            header = {"chrom": None, "span": 1, "start": None, "step": None}
+            block_track_name = track_name
+        yield self._entry(block_track_name, header, positions, values)
+
+    def fast_entries(self, input_fh, chunk_size=2**24):
+        """Return the same entries as entries() but convert the data
+        lines in bulk.
+
+        The file is read in chunks of chunk_size characters. Only the
+        header lines are searched for and handled in Python. The data
+        lines between them are converted to numbers at once by
+        numpy.fromstring instead of being split and converted line by
+        line.
+
+        """
+        track_name = None
+        block_track_name = None
+        header = None
+        number_arrays = []
+        remainder = ""
+        while True:
+            chunk = input_fh.read(chunk_size)
+            text = remainder + chunk
+            if chunk:
+                # Only complete lines are processed.
+                line_end = text.rfind("\n") + 1
+                text, remainder = text[:line_end], text[line_end:]
+            text_pos = 0
+            for line_start, line_end in self._header_lines(text):
+                number_arrays.append(self._numbers(text[text_pos:line_start]))
+                text_pos = line_end
+                row = text[line_start:line_end].split()
+                if row[0].startswith("#") or row[0] == "browser":
+                    continue
+                if row[0].startswith("track"):
+                    track_name = self._track_name(row)
+                elif row[0] in ("variableStep", "fixedStep"):
+                    if header is not None:
+                        yield self._bulk_entry(
+                            block_track_name, header, number_arrays)
+                    number_arrays = []
+                    header = self._block_header(row)
+                    block_track_name = track_name
+            number_arrays.append(self._numbers(text[text_pos:]))
+            if not chunk:
+                break
+        if header is None:
+            header = {"chrom": None, "span": 1, "start": None, "step": None}
+            block_track_name = track_name
+        yield self._bulk_entry(block_track_name, header, number_arrays)
+
+    def fetch(self, wiggle_file, replicon, start=None, end=None,
+              track_name=None):
+        """Return the coverage of a replicon or region of a wiggle file
+
+        For each block of the replicon (optionally only of the given
+        track) a WiggleEntry with the positions whose values overlap
+        the region from start to end (both inclusive, both optional)
+        is returned. Only the data lines of the blocks that can
+        contain these positions are read using a sidecar index (see
+        WiggleIndex).
+
+        """
+        wiggle_index = self._wiggle_indices.index(wiggle_file)
+        with open(wiggle_file, "rb") as wiggle_fh:
+            for block in wiggle_index.blocks(
+                    replicon, start, end, track_name):
+                yield self._fetched_entry(wiggle_fh, block, start, end)
+
+    def _fetched_entry(self, wiggle_fh, block, start, end):
+        header = block["header"]
+        start = _span_start(start, header["span"])
+        positions = []
+        values = []
+        for offset, length, first_pos, last_pos in block["chunks"]:
+            if ((start is not None and last_pos < start) or
+                (end is not None and first_pos > end)):
+                continue
+            wiggle_fh.seek(offset)
+            numbers = self._numbers(wiggle_fh.read(length).decode("utf-8"))
+            if header["step"] is not None:
+                positions.append(np.arange(
+                    first_pos, first_pos + header["step"] * len(numbers),
+                    header["step"], dtype=np.int64))
+                values.append(numbers)
             else:
-                pos_value_pairs.append([int(row[0]), float(row[1])])
-        yield WiggleEntry(track_name, replicon, span, pos_value_pairs)
+                positions.append(numbers[0::2].astype(np.int64))
+                values.append(numbers[1::2])
+        return _region_entry(
+            block["track_name"], header["chrom"], header["span"],
+            header["step"], header["start"], positions, values, start, end)
+
+    def _header_lines(self, text):
+        """Return the sorted (start, end) positions of the header and
+        comment lines in the text.
+
+        """
+        line_starts = []
+        for line_prefix in _header_line_prefixes:
+            if text.startswith(line_prefix):
+                line_starts.append(0)
+            line_start = text.find("\n" + line_prefix)
+            while line_start != -1:
+                line_starts.append(line_start + 1)
+                line_start = text.find("\n" + line_prefix, line_start + 1)
+        header_lines = []
+        for line_start in sorted(line_starts):
+            line_end = text.find("\n", line_start) + 1
+            if line_end == 0:
+                line_end = len(text)
+            header_lines.append((line_start, line_end))
+        return header_lines
+
+    def _numbers(self, text):
+        # numpy.fromstring returns [-1.0] for texts consisting only of
+        # white space.
+        if not text or text.isspace():
+            return np.zeros(0, dtype=np.float64)
+        with warnings.catch_warnings():
+            # numpy.fromstring only warns if it can't convert all of
+            # the text (newer versions raise a ValueError).
+            warnings.simplefilter("error", DeprecationWarning)
+            try:
+                return np.fromstring(text, sep=" ")
+            except DeprecationWarning:
+                raise ValueError("Invalid data line in wiggle file.")
+
+    def _bulk_entry(self, track_name, header, number_arrays):
+        numbers = np.concatenate(number_arrays)
+        if header["step"] is not None:
+            return WiggleEntry(
+                track_name, header["chrom"], header["span"], values=numbers,
+                start=header["start"], step=header["step"])
+        if len(numbers) % 2 != 0:
+            raise ValueError(
+                "Malformed data line in the wiggle block of \"%s\"." % (
+                    header["chrom"]))
+        return WiggleEntry(
+            track_name, header["chrom"], header["span"],
+            positions=numbers[0::2].astype(np.int64),
+            values=numbers[1::2].copy())
+
+    def _entry(self, track_name, header, positions, values):
+        """Create a WiggleEntry sharing the memory of the arrays."""
+        if header["step"] is not None:
+            return WiggleEntry(
+                track_name, header["chrom"], header["span"],
+                values=np.frombuffer(values, dtype=np.float64),
+                start=header["start"], step=header["step"])
+        return WiggleEntry(
+            track_name, header["chrom"], header["span"],
+            positions=np.frombuffer(positions, dtype=np.int64),
+            values=np.frombuffer(values, dtype=np.float64))
+
+    def _block_header(self, row):
+        """Return chrom, span, start and step of a variableStep or
+        fixedStep line. start and step are None for variableStep.
+
+        """
+        attrs_and_values = self._attrs_and_values(row)
+        header = {"chrom": attrs_and_values["chrom"],
+                  "span": int(attrs_and_values.get("span", 1)),
+                  "start": None, "step": None}
+        if row[0] == "fixedStep":
+            header["start"] = int(attrs_and_values["start"])
+            header["step"] = int(attrs_and_values.get("step", 1))
+        return header
 
     def _replicon(self, row):
         return self._attrs_and_values(row)["chrom"]
@@ -51,30 +271,512 @@ class WiggleParser(object):
             attrs_and_values[attr] = value
         return attrs_and_values
 
+class WiggleIndex(SidecarIndex):
+    """A sidecar index for random access into wiggle files
+
+    For each variableStep or fixedStep block the track name and the
+    header values are stored. The data lines of a block are split
+    into chunks of consecutive lines. For each chunk the byte offset
+    and length and the first and last position are stored (see
+    SidecarIndex for how the index is stored and kept up to date).
+
+    """
+
+    def __init__(self, wiggle_file, lines_per_chunk=10000):
+        SidecarIndex.__init__(self, wiggle_file)
+        self._lines_per_chunk = lines_per_chunk
+        self._blocks = []
+        self._wiggle_parser = WiggleParser()
+
+    def _build_index(self):
+        self._blocks = []
+        track_name = None
+        offset = 0
+        chunk_offset = 0
+        chunk_lines = []
+        with open(self._indexed_file, "rb") as wiggle_fh:
+            for line in wiggle_fh:
+                line_offset = offset
+                offset += len(line)
+                if not line.startswith(_binary_header_line_prefixes):
+                    if len(chunk_lines) == 0:
+                        chunk_offset = line_offset
+                    chunk_lines.append(line)
+                    if len(chunk_lines) == self._lines_per_chunk:
+                        self._add_chunk(chunk_offset, chunk_lines)
+                        chunk_lines = []
+                    continue
+                self._add_chunk(chunk_offset, chunk_lines)
+                chunk_lines = []
+                row = line.decode("utf-8").split()
+                if row[0].startswith("track"):
+                    track_name = self._wiggle_parser._track_name(row)
+                elif row[0] in ("variableStep", "fixedStep"):
+                    self._blocks.append({
+                        "track_name": track_name,
+                        "header": self._wiggle_parser._block_header(row),
+                        "chunks": [], "value_number": 0})
+        self._add_chunk(chunk_offset, chunk_lines)
+
+    def _index_data(self):
+        return {"blocks" : self._blocks}
+
+    def _set_index_data(self, index_data):
+        self._blocks = index_data["blocks"]
+
+    def blocks(self, replicon, start=None, end=None, track_name=None):
+        """Return the blocks of the replicon (and track) that have
+        chunks with positions from start to end.
+
+        Each block is a dictionary with the track name, the header
+        values (see WiggleParser._block_header) and the chunks as
+        lists of byte offset, length, first and last position.
+
+        """
+        matching_blocks = []
+        for block in self._blocks:
+            header = block["header"]
+            if header["chrom"] != replicon:
+                continue
+            if track_name is not None and block["track_name"] != track_name:
+                continue
+            if any([(start is None or
+                     last_pos + header["span"] - 1 >= start) and
+                    (end is None or first_pos <= end)
+                    for offset, length, first_pos, last_pos
+                    in block["chunks"]]):
+                matching_blocks.append(block)
+        return matching_blocks
+
+    def _add_chunk(self, chunk_offset, chunk_lines):
+        if len(chunk_lines) == 0 or len(self._blocks) == 0:
+            return
+        block = self._blocks[-1]
+        header = block["header"]
+        chunk_text = b"".join(chunk_lines).decode("utf-8")
+        if header["step"] is not None:
+            value_number = len(chunk_text.split())
+            if value_number == 0:
+                return
+            first_pos = (header["start"] +
+                         header["step"] * block["value_number"])
+            last_pos = first_pos + header["step"] * (value_number - 1)
+            block["value_number"] += value_number
+        else:
+            positions = self._wiggle_parser._numbers(chunk_text)[0::2]
+            if len(positions) == 0:
+                return
+            first_pos = int(positions.min())
+            last_pos = int(positions.max())
+        block["chunks"].append([
+            chunk_offset, sum([len(line) for line in chunk_lines]),
+            first_pos, last_pos])
+
 class WiggleEntry(object):
+    """The coverage of a replicon in a wiggle track
+
+    The positions and values are stored in the NumPy arrays
+    self.positions (int64) and self.values (float64). For
+    compatibility they can also be read and set as a list of
+    [position, value] lists via pos_value_pairs. This list is
+    generated on each access so it should not be used for large
+    entries.
+
+    Entries of fixedStep blocks are created with start and step
+    instead of positions. Only the values are stored then and the
+    positions are generated when self.positions is accessed.
+
+    span is the number of nucleotides covered by each value.
+
+    """
 
-    def __init__(self, track_name, replicon, span, pos_value_pairs):
+    def __init__(self, track_name, replicon, span, pos_value_pairs=None,
+                 positions=None, values=None, start=None, step=None):
         self.track_name = track_name
         self.replicon = replicon
         self.span = span
-        self.pos_value_pairs = pos_value_pairs
+        self.start = start
+        self.step = step
+        if pos_value_pairs is not None:
+            self.pos_value_pairs = pos_value_pairs
+            return
+        self.values = np.asarray(
+            values if values is not None else [], dtype=np.float64)
+        if step is None:
+            self.positions = positions if positions is not None else []
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def positions(self):
+        if self.step is not None:
+            return np.arange(
+                self.start, self.start + self.step * len(self.values),
+                self.step, dtype=np.int64)
+        return self._positions
+
+    @positions.setter
+    def positions(self, positions):
+        self._positions = np.asarray(positions, dtype=np.int64)
+        self.start = None
+        self.step = None
+
+    @property
+    def pos_value_pairs(self):
+        return [[pos, value] for pos, value in zip(
+            self.positions.tolist(), self.values.tolist())]
+
+    @pos_value_pairs.setter
+    def pos_value_pairs(self, pos_value_pairs):
+        self.positions = [pos for pos, value in pos_value_pairs]
+        self.values = np.array(
+            [value for pos, value in pos_value_pairs], dtype=np.float64)
 
 class WiggleWriter(object):
+    """Write coverages as wiggle file
 
-    def __init__(self, track_str, fh):
+    The coverages can be given as iterable of [position, value] pairs
+    or as arrays of positions and values. Zero values are removed and
+    the remaining ones are multiplied by the factor with NumPy. The
+    lines are formatted and written in chunks of chunk_size lines.
+
+    """
+
+    def __init__(self, track_str, fh, chunk_size=100000):
         self._fh = fh
+        self._chunk_size = chunk_size
         self._fh.write(("track type=wiggle_0 name=\"%s\"\n" % (track_str)))
 
     def write_replicons_coverages(
-            self, replicon, pos_value_pairs, factor=1.0):
-            self._fh.write("variableStep chrom=%s span=1\n" % (replicon))
-            # Filter values of 0 and multiply the remaining ones by
-            # the given factor.
-            self._fh.write(
-                "\n".join(["%s %s" % (pos, coverage * factor)
-                           for pos, coverage in
-                           filter(lambda pos_and_cov: pos_and_cov[1] != 0.0,
-                                  pos_value_pairs)]) + "\n")
+            self, replicon, pos_value_pairs=None, factor=1.0, positions=None,
+            values=None, min_fixed_step_length=None):
+        """Write the coverage of a replicon
+
+        If min_fixed_step_length is given, stretches of at least this
+        number of consecutive positions with non-zero values are
+        written as fixedStep blocks and the other positions as
+        variableStep blocks. Otherwise a single variableStep block is
+        written. Positions that are not integers are written as given
+        and always in a single variableStep block.
+
+        """
+        if pos_value_pairs is not None:
+            pos_value_pairs = list(pos_value_pairs)
+            positions = [pos for pos, coverage in pos_value_pairs]
+            values = [coverage for pos, coverage in pos_value_pairs]
+        positions = self._position_array(positions)
+        values = np.asarray(
+            values if values is not None else [], dtype=np.float64)
+        # Filter values of 0 and multiply the remaining ones by the
+        # given factor.
+        non_zero = values != 0.0
+        positions = positions[non_zero]
+        values = values[non_zero] * factor
+        if (min_fixed_step_length is None or len(positions) == 0 or
+            positions.dtype == object):
+            self._write_variable_step(replicon, positions, values)
+            return
+        for block_start, block_end, is_fixed_step in self._blocks(
+                positions, min_fixed_step_length):
+            if is_fixed_step:
+                self._write_fixed_step(
+                    replicon, positions[block_start],
+                    values[block_start:block_end])
+            else:
+                self._write_variable_step(
+                    replicon, positions[block_start:block_end],
+                    values[block_start:block_end])
+
+    def _position_array(self, positions):
+        """Return the positions as int64 array or, if they are not all
+        integers, as object array of the given positions.
+
+        """
+        if positions is None:
+            return np.zeros(0, dtype=np.int64)
+        position_array = np.asarray(positions)
+        if len(position_array) == 0 or np.issubdtype(
+                position_array.dtype, np.integer):
+            return position_array.astype(np.int64)
+        object_positions = np.empty(len(position_array), dtype=object)
+        object_positions[:] = list(positions)
+        return object_positions
+
+    def _blocks(self, positions, min_fixed_step_length):
+        """Return the start and end indices of the blocks of positions
+        and whether they are written as fixedStep block.
+
+        """
+        run_borders = np.concatenate((
+            [0], np.flatnonzero(np.diff(positions) != 1) + 1,
+            [len(positions)]))
+        is_long_run = np.diff(run_borders) >= min_fixed_step_length
+        blocks = []
+        for run_index, is_fixed_step in enumerate(is_long_run.tolist()):
+            run_start = int(run_borders[run_index])
+            run_end = int(run_borders[run_index + 1])
+            # Consecutive short runs are combined to one variableStep
+            # block.
+            if blocks and not is_fixed_step and not blocks[-1][2]:
+                blocks[-1][1] = run_end
+            else:
+                blocks.append([run_start, run_end, is_fixed_step])
+        return blocks
+
+    def _write_variable_step(self, replicon, positions, values):
+        self._fh.write("variableStep chrom=%s span=1\n" % (replicon))
+        self._write_lines(positions, values)
+
+    def _write_fixed_step(self, replicon, start, values):
+        self._fh.write("fixedStep chrom=%s start=%s step=1 span=1\n" % (
+            replicon, start))
+        self._write_lines(None, values)
+
+    def _write_lines(self, positions, values):
+        for chunk_start in range(0, max(len(values), 1), self._chunk_size):
+            chunk_end = chunk_start + self._chunk_size
+            value_strings = self._value_strings(values[chunk_start:chunk_end])
+            if positions is None:
+                lines = value_strings
+            else:
+                lines = map(" ".join, zip(
+                    map(str, positions[chunk_start:chunk_end].tolist()),
+                    value_strings))
+            self._fh.write("\n".join(lines) + "\n")
+
+    def _value_strings(self, values):
+        """Return the values formatted like str(value).
+
+        Coverages usually consist of few distinct values. In this case
+        each distinct value is formatted only once.
+
+        """
+        distinct_values, value_indices = np.unique(
+            values, return_inverse=True)
+        if len(distinct_values) > len(values) // 2:
+            return list(map(repr, values.tolist()))
+        return np.array(
+            list(map(repr, distinct_values.tolist())),
+            dtype=object)[value_indices].tolist()
 
     def close_file(self):
         self._fh.close()
+
+class BinaryCoverageWriter(object):
+    """Write coverages to a compact binary file
+
+    The file starts with a magic string followed by zlib compressed
+    blocks and ends with a compressed JSON index and the byte offset
+    of this index (8 bytes, little endian). For each entry (a
+    WiggleEntry) the index contains the track name, replicon, span
+    and (for fixedStep entries) start and step as well as
+    - the chunks: byte offset, length, smallest and largest
+      position, number of values and first position of blocks of
+      positions_per_chunk values. The positions are stored as
+      differences to the previous position (omitted for fixedStep
+      entries) followed by the values.
+    - the zoom levels: for each bin size the byte offset and length
+      of a block with the number of values, their sum, minimum and
+      maximum per bin (bin n covers the positions n * bin_size + 1 to
+      (n + 1) * bin_size).
+
+    Example:
+    with open("coverage.kcov", "wb") as coverage_fh:
+        binary_coverage_writer = BinaryCoverageWriter(coverage_fh)
+        for entry in WiggleParser().fast_entries(open("coverage.wig")):
+            binary_coverage_writer.write_entry(entry)
+        binary_coverage_writer.close()
+
+    """
+
+    magic = b"KUFPYBIO_COVERAGE_1\n"
+
+    def __init__(self, fh, positions_per_chunk=65536,
+                 zoom_bin_sizes=(1000, 10000, 100000)):
+        self._fh = fh
+        self._positions_per_chunk = positions_per_chunk
+        self._zoom_bin_sizes = zoom_bin_sizes
+        self._entries = []
+        self._fh.write(self.magic)
+        self._offset = len(self.magic)
+
+    def write_entry(self, wiggle_entry):
+        values = np.asarray(wiggle_entry.values, dtype="<f8")
+        positions = np.asarray(wiggle_entry.positions, dtype="<i8")
+        entry_info = {
+            "track_name": wiggle_entry.track_name,
+            "replicon": wiggle_entry.replicon,
+            "span": wiggle_entry.span,
+            "start": wiggle_entry.start,
+            "step": wiggle_entry.step,
+            "value_number": len(values),
+            "chunks": [],
+            "zoom_levels": {}}
+        for chunk_start in range(0, len(values), self._positions_per_chunk):
+            chunk_end = chunk_start + self._positions_per_chunk
+            chunk_positions = positions[chunk_start:chunk_end]
+            chunk_values = values[chunk_start:chunk_end]
+            data = chunk_values.tobytes()
+            if wiggle_entry.step is None:
+                data = np.diff(
+                    chunk_positions,
+                    prepend=chunk_positions[0]).astype("<i8").tobytes() + data
+            entry_info["chunks"].append(self._write_block(data) + [
+                int(chunk_positions.min()), int(chunk_positions.max()),
+                len(chunk_values), int(chunk_positions[0])])
+        for bin_size in self._zoom_bin_sizes:
+            entry_info["zoom_levels"][str(bin_size)] = self._write_block(
+                self._zoom_level(positions, values, bin_size).tobytes())
+        self._entries.append(entry_info)
+
+    def close(self):
+        """Write the index. The file handle is not closed."""
+        index_offset = self._offset
+        self._write_block(json.dumps({"entries": self._entries}).encode(
+            "utf-8"))
+        self._fh.write(struct.pack("<Q", index_offset))
+        self._fh.flush()
+
+    def _zoom_level(self, positions, values, bin_size):
+        """Return a matrix with the bin indices, numbers of values,
+        sums, minima and maxima of the non-empty bins.
+
+        """
+        bin_indices, value_bins = np.unique(
+            (positions - 1) // bin_size, return_inverse=True)
+        zoom_level = np.zeros((5, len(bin_indices)), dtype="<f8")
+        zoom_level[0] = bin_indices
+        zoom_level[1] = np.bincount(value_bins, minlength=len(bin_indices))
+        zoom_level[2] = np.bincount(
+            value_bins, weights=values, minlength=len(bin_indices))
+        zoom_level[3] = np.inf
+        zoom_level[4] = -np.inf
+        np.minimum.at(zoom_level[3], value_bins, values)
+        np.maximum.at(zoom_level[4], value_bins, values)
+        return zoom_level
+
+    def _write_block(self, data):
+        compressed_data = zlib.compress(data)
+        self._fh.write(compressed_data)
+        block = [self._offset, len(compressed_data)]
+        self._offset += len(compressed_data)
+        return block
+
+class BinaryCoverageReader(object):
+    """Read coverages from files written by BinaryCoverageWriter
+
+    Only the index is read when the reader is created. The chunks and
+    zoom levels are read when they are requested.
+
+    """
+
+    def __init__(self, fh):
+        self._fh = fh
+        self._fh.seek(0)
+        if self._fh.read(len(BinaryCoverageWriter.magic)) != (
+                BinaryCoverageWriter.magic):
+            raise ValueError("Not a binary coverage file.")
+        self._fh.seek(-8, os.SEEK_END)
+        index_end = self._fh.tell()
+        index_offset = struct.unpack("<Q", self._fh.read(8))[0]
+        self._entry_infos = json.loads(self._read_block(
+            [index_offset, index_end - index_offset]).decode("utf-8"))[
+                "entries"]
+
+    def replicons(self):
+        """Return the replicons in the order of their first entry."""
+        replicons = []
+        for entry_info in self._entry_infos:
+            if entry_info["replicon"] not in replicons:
+                replicons.append(entry_info["replicon"])
+        return replicons
+
+    def entries(self):
+        """Return all entries as WiggleEntry."""
+        for entry_info in self._entry_infos:
+            yield self._entry(entry_info, None, None)
+
+    def fetch(self, replicon, start=None, end=None, track_name=None):
+        """Return the coverage of a replicon or region
+
+        For each entry of the replicon (optionally only of the given
+        track) a WiggleEntry with the positions whose values overlap
+        the region from start to end (both inclusive, both optional)
+        is returned. Only the chunks that can contain these positions
+        are read.
+
+        """
+        for entry_info in self._matching_entry_infos(replicon, track_name):
+            yield self._entry(entry_info, start, end)
+
+    def zoom(self, replicon, bin_size, start=None, end=None,
+             track_name=None):
+        """Return the summary of the coverage of a replicon at a zoom
+        level
+
+        For each entry of the replicon (optionally only of the given
+        track) a dictionary with the arrays "bin_starts",
+        "bin_ends", "value_numbers", "sums", "minima", "maxima" and
+        "means" of the non-empty bins overlapping the region is
+        returned. The bin size must be one of the bin sizes the file
+        was written with.
+
+        """
+        for entry_info in self._matching_entry_infos(replicon, track_name):
+            block = entry_info["zoom_levels"].get(str(bin_size))
+            if block is None:
+                raise ValueError("No zoom level with the bin size %s." % (
+                    bin_size))
+            zoom_level = np.frombuffer(
+                self._read_block(block), dtype="<f8").reshape(5, -1)
+            bin_starts = zoom_level[0].astype(np.int64) * bin_size + 1
+            bin_ends = bin_starts + bin_size - 1
+            in_region = np.ones(len(bin_starts), dtype=bool)
+            if start is not None:
+                in_region &= bin_ends >= start
+            if end is not None:
+                in_region &= bin_starts <= end
+            value_numbers = zoom_level[1][in_region].astype(np.int64)
+            yield {"bin_starts": bin_starts[in_region],
+                   "bin_ends": bin_ends[in_region],
+                   "value_numbers": value_numbers,
+                   "sums": zoom_level[2][in_region],
+                   "minima": zoom_level[3][in_region],
+                   "maxima": zoom_level[4][in_region],
+                   "means": zoom_level[2][in_region] / value_numbers}
+
+    def _matching_entry_infos(self, replicon, track_name):
+        return [entry_info for entry_info in self._entry_infos
+                if entry_info["replicon"] == replicon and
+                (track_name is None or entry_info["track_name"] == track_name)]
+
+    def _entry(self, entry_info, start, end):
+        start = _span_start(start, entry_info["span"])
+        positions = []
+        values = []
+        for (offset, length, min_pos, max_pos, value_number,
+             first_pos) in entry_info["chunks"]:
+            if ((start is not None and max_pos < start) or
+                (end is not None and min_pos > end)):
+                continue
+            data = self._read_block([offset, length])
+            if entry_info["step"] is None:
+                positions.append(first_pos + np.cumsum(np.frombuffer(
+                    data, dtype="<i8", count=value_number)))
+                values.append(np.frombuffer(
+                    data, dtype="<f8", offset=8 * value_number))
+            else:
+                positions.append(np.arange(
+                    first_pos, max_pos + 1, entry_info["step"],
+                    dtype=np.int64))
+                values.append(np.frombuffer(data, dtype="<f8"))
+        return _region_entry(
+            entry_info["track_name"], entry_info["replicon"],
+            entry_info["span"], entry_info["step"], entry_info["start"],
+            positions, values, start, end)
+
+    def _read_block(self, block):
+        offset, length = block[:2]
+        self._fh.seek(offset)
+        return zlib.decompress(self._fh.read(length))
@@ -17,8 +17,9 @@ TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
 PERFORMANCE OF THIS SOFTWARE.
 
 """
-__description__ = ("Calculate the Pearson correlation coefficient "
-                   "for the coverages of two wiggle files.")
+__description__ = ("Calculate the Pearson or Spearman correlation "
+                   "coefficient for the coverages of two wiggle files or "
+                   "the correlation matrix of several wiggle files.")
 __author__ = "Konrad Foerstner <konrad@foerstner.org>"
 __copyright__ = "2013 by Konrad Foerstner <konrad@foerstner.org>"
 __license__ = "ISC license"
@@ -26,46 +27,179 @@ __email__ = "konrad@foerstner.org"
 __version__ = ""
 
 import argparse
-
-from wiggle import WiggleParser
+import os
+import sys
+sys.path.append(".")
+from kufpybio.coveragecorrelation import (
+    CoverageCorrelator, CorrelationMatrixAccumulator)
+from kufpybio.helpers import parallel_map
+from kufpybio.wiggle import WiggleParser
 import numpy as np
 from scipy import stats
-import matplotlib.pyplot as plt
 
 def main():
     parser = argparse.ArgumentParser(description=__description__)
-    parser.add_argument("wiggle_file_1", type=argparse.FileType("r"))
-    parser.add_argument("wiggle_file_2", type=argparse.FileType("r"))
+    parser.add_argument("wiggle_files", nargs="+",
+                        type=argparse.FileType("r"))
+    parser.add_argument("--method", choices=["pearson", "spearman"],
+                        default="pearson")
+    parser.add_argument(
+        "--matrix_file", type=argparse.FileType("w"), default=None,
+        help="Write the correlation coefficients of all pairs of the "
+        "wiggle files over all replicons as tab separated matrix to this "
+        "file.")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of processes used to merge the coverages of the "
+        "replicons in the matrix mode.")
     args = parser.parse_args()
-    wiggel_correlator = WiggleCorrelator()
-    wiggel_correlator.correlate(args.wiggle_file_1, args.wiggle_file_2)
+    wiggel_correlator = WiggleCorrelator(args.method)
+    if args.matrix_file is not None:
+        wiggel_correlator.write_correlation_matrix(
+            args.wiggle_files, args.matrix_file, args.workers)
+    elif len(args.wiggle_files) == 2:
+        wiggel_correlator.correlate(*args.wiggle_files)
+    else:
+        parser.error("Exactly two wiggle files are required without "
+                     "--matrix_file.")
 
 class WiggleCorrelator(object):
 
-    def __init__(self):
+    def __init__(self, method="pearson"):
         self._wiggle_parser = WiggleParser()
+        self._coverage_correlator = CoverageCorrelator()
+        self._method = method
 
     def correlate(self, wiggle_file_1, wiggle_file_2):
-        self._chrom_and_pos_value_pairs = {}
-        print("Replicon: Pearson correlation coefficient (p-value)")
-        for entry_1, entry_2 in zip(
-                self._wiggle_parser.entries(wiggle_file_1),
-                self._wiggle_parser.entries(wiggle_file_2)):
-                assert(entry_1.replicon == entry_2.replicon)
-                pos_value_pairs_1 = dict(entry_1.pos_value_pairs)
-                pos_value_pairs_2 = dict(entry_2.pos_value_pairs)
-                if len(pos_value_pairs_1) == 0 or len(pos_value_pairs_2) == 0:
-                    print("%s: At least one replicon has no coverage for "
-                          "this libs." % (entry_2.replicon))
-                    continue
-                non_redu_pos = set(
-                    pos_value_pairs_1.keys() + pos_value_pairs_2.keys())
-                values_1 = np.array(
-                    [pos_value_pairs_1.get(pos, 0.0) for pos in non_redu_pos])
-                values_2 = np.array(
-                    [pos_value_pairs_2.get(pos, 0.0) for pos in non_redu_pos])
-                pearson, pvalue = stats.pearsonr(values_1, values_2)
-                print("%s: %s (%s)" % (entry_1.replicon, pearson, pvalue))
+        """Print the correlation coefficient of each replicon.
+
+        The replicons of the two files are matched by their names.
+        Positions that are only covered in one file are counted with
+        a coverage of 0.0 in the other file.
+
+        """
+        replicons_and_coverages_1 = self._replicons_and_coverages(
+            wiggle_file_1)
+        replicons_and_coverages_2 = self._replicons_and_coverages(
+            wiggle_file_2)
+        print("Replicon: %s correlation coefficient (p-value)" % (
+            self._method.capitalize()))
+        for replicon in self._replicons(
+                replicons_and_coverages_1, replicons_and_coverages_2):
+            positions_1, values_1 = replicons_and_coverages_1.get(
+                replicon, ([], []))
+            positions_2, values_2 = replicons_and_coverages_2.get(
+                replicon, ([], []))
+            if len(positions_1) == 0 or len(positions_2) == 0:
+                print("%s: At least one replicon has no coverage for "
+                      "this libs." % (replicon))
+                continue
+            values_1, values_2 = self._coverage_correlator.merge(
+                positions_1, values_1, positions_2, values_2)
+            if self._method == "spearman":
+                coefficient = self._coverage_correlator.spearman(
+                    values_1, values_2)
+            else:
+                coefficient = self._coverage_correlator.pearson(
+                    values_1, values_2)
+            print("%s: %s (%s)" % (replicon, coefficient, self._p_value(
+                coefficient, len(values_1))))
+
+    def write_correlation_matrix(self, wiggle_files, matrix_fh, workers=1):
+        """Write the correlation coefficients of all pairs of wiggle
+        files as tab separated matrix.
+
+        Each file is parsed once. The coverages of each replicon are
+        merged into a matrix with one row per file (positions only
+        covered in some files get 0.0 in the others). For Pearson
+        only the statistics of these matrices are combined over the
+        replicons. For Spearman the matrices of all replicons are
+        needed to rank the values.
+
+        """
+        libraries = [os.path.basename(wiggle_fh.name)
+                     for wiggle_fh in wiggle_files]
+        libraries_and_coverages = [
+            self._replicons_and_coverages(wiggle_fh)
+            for wiggle_fh in wiggle_files]
+        replicons = []
+        for replicons_and_coverages in libraries_and_coverages:
+            replicons.extend([replicon for replicon in replicons_and_coverages
+                              if replicon not in replicons])
+        empty_coverage = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        replicon_jobs = [
+            ([replicons_and_coverages.get(replicon, empty_coverage)
+              for replicons_and_coverages in libraries_and_coverages],
+             self._method) for replicon in replicons]
+        replicon_statistics = list(parallel_map(
+            _replicon_statistics, replicon_jobs, workers))
+        if self._method == "spearman":
+            correlation_matrix = self._coverage_correlator.correlation_matrix(
+                np.hstack([np.zeros((len(libraries), 0))] +
+                          replicon_statistics), "spearman")
+        else:
+            correlation_matrix_accumulator = CorrelationMatrixAccumulator(
+                len(libraries))
+            for correlation_matrix_accumulator_of_replicon in (
+                    replicon_statistics):
+                correlation_matrix_accumulator.add_accumulator(
+                    correlation_matrix_accumulator_of_replicon)
+            correlation_matrix = correlation_matrix_accumulator.pearson()
+        matrix_fh.write("\t".join([""] + libraries) + "\n")
+        for library, coefficients in zip(libraries, correlation_matrix):
+            matrix_fh.write("\t".join(
+                [library] + [str(coefficient)
+                             for coefficient in coefficients]) + "\n")
+
+    def _replicons_and_coverages(self, wiggle_fh):
+        """Return the concatenated positions and values of the blocks
+        of each replicon.
+
+        """
+        replicons_and_entries = {}
+        for entry in self._wiggle_parser.fast_entries(wiggle_fh):
+            replicons_and_entries.setdefault(entry.replicon, []).append(entry)
+        return dict([(replicon, (
+            np.concatenate([entry.positions for entry in entries]),
+            np.concatenate([entry.values for entry in entries])))
+                     for replicon, entries in replicons_and_entries.items()])
+
+    def _replicons(self, replicons_and_coverages_1,
+                   replicons_and_coverages_2):
+        return list(replicons_and_coverages_1.keys()) + [
+            replicon for replicon in replicons_and_coverages_2
+            if replicon not in replicons_and_coverages_1]
+
+    def _p_value(self, coefficient, value_number):
+        """Return the two-sided p-value of the correlation coefficient
+        based on the t-distribution (as scipy.stats.pearsonr and
+        scipy.stats.spearmanr).
+
+        """
+        if value_number < 3 or np.isnan(coefficient):
+            return float("nan")
+        if abs(coefficient) == 1.0:
+            return 0.0
+        t_value = coefficient * np.sqrt(
+            (value_number - 2) / (1.0 - coefficient ** 2))
+        return 2 * stats.t.sf(abs(t_value), value_number - 2)
+
+def _replicon_statistics(replicon_job):
+    """Merge the coverages of a replicon and return the value matrix
+    (Spearman) or its CorrelationMatrixAccumulator (Pearson) (run by
+    parallel_map).
+
+    """
+    coverages, method = replicon_job
+    value_matrix = CoverageCorrelator().merge_libraries(
+        [positions for positions, values in coverages],
+        [values for positions, values in coverages])
+    if method == "spearman":
+        return value_matrix
+    correlation_matrix_accumulator = CorrelationMatrixAccumulator(
+        len(coverages))
+    correlation_matrix_accumulator.add(value_matrix)
+    return correlation_matrix_accumulator
 
 if __name__ == "__main__":
    main()
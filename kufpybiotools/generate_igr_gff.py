@@ -8,53 +8,143 @@ __email__ = "konrad@foerstner.org"
 __version__ = ""
 
 import argparse
-import csv
 import sys
 sys.path.append(".")
+from kufpybio.annotationcache import AnnotationCache, is_cacheable
 from kufpybio.gff3 import Gff3Parser, Gff3Entry
 from kufpybio.gene import Gene
+from kufpybio.helpers import parallel_map
 from kufpybio.igrfinder import IGRFinder
 
-parser = argparse.ArgumentParser(description=__description__)
-parser.add_argument("gff_file", type=argparse.FileType("r"))
-parser.add_argument("output_file", type=argparse.FileType("w"))
-parser.add_argument("--margin", type=int, default=0)
-parser.add_argument("--plus_only", default=False, action="store_true")
-args = parser.parse_args()
-# Build gene list
-gene_list = []
-gff_parser = Gff3Parser()
-region_entry = None
-for entry in gff_parser.entries(args.gff_file):
-    if entry.feature == "region":
-        region_entry = entry
-        continue
-    gene_list.append(Gene(
-        entry.seq_id, "", "", entry.start, entry.end,
-        entry.strand))
-# Find IGRs and generate GFF file
-igr_finder = IGRFinder()
-args.output_file.write("##gff-version 3\n")
-
-strands = ["+", "-"]
-if args.plus_only is True:
-    strands = ["+"]
-
-for start, end in igr_finder.find_igrs(gene_list, region_entry.end):
-    start = start + args.margin
-    end = end - args.margin
-    if end <= start:
-        continue
-    for strand in strands:
-        gff3_entry = Gff3Entry({
-            "seq_id" : region_entry.seq_id,
-            "source" : "IGR",
-            "feature" : "IGR",
-            "start" : start,
-            "end" : end,
-            "score" : ".",
-            "strand" : strand,
-            "phase" : ".",
-            "attributes" : "ID=IGR_%s_%s_to_%s" % (
-                    region_entry.seq_id, start, end)})
-        args.output_file.write(str(gff3_entry) + "\n")
+def main():
+    parser = argparse.ArgumentParser(description=__description__)
+    parser.add_argument("gff_file", type=argparse.FileType("r"))
+    parser.add_argument("output_file", type=argparse.FileType("w"))
+    parser.add_argument("--margin", type=int, default=0)
+    parser.add_argument("--plus_only", default=False, action="store_true")
+    parser.add_argument(
+        "--per_strand", default=False, action="store_true",
+        help="Compute the IGRs of each strand based only on the genes "
+        "of this strand.")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of processes used to compute the IGRs of the "
+        "replicons.")
+    parser.add_argument(
+        "--annotation_cache_dir", default=None,
+        help="Directory of a binary cache of parsed GFF files. The GFF "
+        "file must be a regular file (not standard input or a pipe).")
+    args = parser.parse_args()
+    if (args.annotation_cache_dir is not None and
+        not is_cacheable(args.gff_file)):
+        parser.error("--annotation_cache_dir requires a regular GFF file "
+                     "(not standard input or a pipe).")
+    strands = ["+", "-"]
+    if args.plus_only is True:
+        strands = ["+"]
+    igr_gff_generator = IGRGffGenerator(
+        args.gff_file, args.output_file, args.margin, strands,
+        args.per_strand, args.workers, args.annotation_cache_dir)
+    igr_gff_generator.read_replicons_and_genes()
+    igr_gff_generator.write_igrs()
+
+class IGRGffGenerator(object):
+
+    def __init__(self, gff_fh, output_fh, margin=0, strands=["+", "-"],
+                 per_strand=False, workers=1, annotation_cache_dir=None):
+        self.gff_fh = gff_fh
+        self.output_fh = output_fh
+        self.margin = margin
+        self.strands = strands
+        self.per_strand = per_strand
+        self.workers = workers
+        self.annotation_cache_dir = annotation_cache_dir
+
+    def read_replicons_and_genes(self):
+        """Collect the length of each replicon (given by its region
+        entry) and the genes located on it. The replicons are kept in
+        the order of their region entries.
+
+        """
+        self.replicons_and_lengths = {}
+        self.replicons_and_genes = {}
+        self.replicons = []
+        if self.annotation_cache_dir is None:
+            entries = Gff3Parser().fast_entries(self.gff_fh)
+        else:
+            entries = AnnotationCache(self.annotation_cache_dir).load(
+                self.gff_fh.name).records()
+        for entry in entries:
+            if entry.feature == "region":
+                if entry.seq_id not in self.replicons_and_lengths:
+                    self.replicons.append(entry.seq_id)
+                    self.replicons_and_lengths[entry.seq_id] = entry.end
+                self.replicons_and_lengths[entry.seq_id] = max(
+                    self.replicons_and_lengths[entry.seq_id], entry.end)
+                continue
+            self.replicons_and_genes.setdefault(entry.seq_id, []).append(
+                Gene(entry.seq_id, "", "", entry.start, entry.end,
+                     entry.strand))
+        for seq_id in self.replicons_and_genes:
+            if seq_id not in self.replicons_and_lengths:
+                sys.stderr.write(
+                    "Skipping genes of \"%s\" - no region entry.\n" % seq_id)
+
+    def write_igrs(self):
+        """Compute the IGRs of the replicons and write them as GFF3.
+
+        With more than one worker the replicons are processed in
+        parallel. The output is written replicon by replicon as soon
+        as the IGRs of a replicon are available.
+
+        """
+        self.output_fh.write("##gff-version 3\n")
+        replicon_jobs = [
+            (seq_id, self.replicons_and_lengths[seq_id],
+             self.replicons_and_genes.get(seq_id, []), self.strands,
+             self.per_strand) for seq_id in self.replicons]
+        for seq_id, strands_and_igrs in parallel_map(
+                _replicon_igrs, replicon_jobs, self.workers):
+            self._write_replicon_igrs(seq_id, strands_and_igrs)
+
+    def _write_replicon_igrs(self, seq_id, strands_and_igrs):
+        output_lines = []
+        for start, end, strands in strands_and_igrs:
+            start = start + self.margin
+            end = end - self.margin
+            if end <= start:
+                continue
+            for strand in strands:
+                gff3_entry = Gff3Entry({
+                    "seq_id" : seq_id,
+                    "source" : "IGR",
+                    "feature" : "IGR",
+                    "start" : start,
+                    "end" : end,
+                    "score" : ".",
+                    "strand" : strand,
+                    "phase" : ".",
+                    "attributes" : "ID=IGR_%s_%s_to_%s" % (
+                        seq_id, start, end)})
+                output_lines.append(str(gff3_entry) + "\n")
+        self.output_fh.write("".join(output_lines))
+
+def _replicon_igrs(replicon_job):
+    """Return the IGRs of a replicon as (start, end, strands) tuples
+    (run by parallel_map).
+
+    """
+    seq_id, element_length, gene_list, strands, per_strand = replicon_job
+    igr_finder = IGRFinder()
+    if not per_strand:
+        return (seq_id, [
+            (start, end, strands)
+            for start, end in igr_finder.find_igrs(gene_list, element_length)])
+    strands_and_igrs = igr_finder.find_igrs_per_strand(
+        gene_list, element_length, strands)
+    return (seq_id, sorted([
+        (start, end, [strand]) for strand in strands
+        for start, end in strands_and_igrs[strand]]))
+
+if __name__ == "__main__":
+    main()
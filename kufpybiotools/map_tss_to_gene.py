@@ -10,7 +10,9 @@ __version__ = ""
 import argparse
 import csv
 import sys
+import numpy as np
 sys.path.append(".")
+from kufpybio.annotationcache import AnnotationCache, is_cacheable
 from kufpybio.gff3 import Gff3Parser
 from kufpybio.tss import TSS
 from kufpybio.gene import Gene
@@ -23,43 +25,91 @@ def main():
     parser.add_argument("output_file", type=argparse.FileType("w"))
     parser.add_argument("--min_dist_to_gene_end", default=100)
     parser.add_argument("--orphan_distance", default=300)
+    parser.add_argument(
+        "--sorted_input", default=False, action="store_true",
+        help="The TSS table is sorted by position. "
+        "All TSS of a replicon must follow each other in the TSS table. "
+        "The TSS are mapped and written in a single streaming pass.")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of processes used to map the replicons.")
+    parser.add_argument(
+        "--compact", default=False, action="store_true",
+        help="Store the TSS-gene associations in a compact table. This "
+        "reduces the memory consumption for large TSS lists.")
+    parser.add_argument(
+        "--buffer_lines", type=int, default=10000,
+        help="Number of output lines that are collected and written "
+        "at once.")
+    parser.add_argument(
+        "--annotation_cache_dir", default=None,
+        help="Directory of a binary cache of parsed GFF files. Repeated "
+        "runs with the same GFF file skip the parsing. The GFF file must "
+        "be a regular file (not standard input or a pipe).")
+    parser.add_argument(
+        "--with_replicon_column", default=False, action="store_true",
+        help="Add the replicon of the TSS as first column to the output "
+        "table.")
     args = parser.parse_args()
+    if (args.annotation_cache_dir is not None and
+        not is_cacheable(args.gff_file)):
+        parser.error("--annotation_cache_dir requires a regular GFF file "
+                     "(not standard input or a pipe).")
     mapper = Mapper(
         args.tss_list_file, args.gff_file, args.output_file, 
-        args.min_dist_to_gene_end, args.orphan_distance)
-    mapper.create_tss_list()
+        args.min_dist_to_gene_end, args.orphan_distance, args.workers,
+        args.buffer_lines, args.annotation_cache_dir,
+        args.with_replicon_column)
     mapper.create_gene_list()
-    mapper.map_tss()
-    mapper.write_output()
+    if args.sorted_input is True:
+        mapper.map_sorted_tss_and_write_output()
+    else:
+        mapper.create_tss_list()
+        if args.compact is True:
+            mapper.map_tss_compact()
+        else:
+            mapper.map_tss()
+        mapper.write_output()
 
 class Mapper(object):
 
     def __init__(self, tss_list_fh, gff_fh, output_fh, min_dist_to_gene_end, 
-                 orphan_distance):
+                 orphan_distance, workers=1, buffer_lines=10000,
+                 annotation_cache_dir=None, with_replicon_column=False):
         self.tss_list_fh = tss_list_fh
         self.gff_fh = gff_fh
         self.output_fh = output_fh
         self.min_dist_to_gene_end = min_dist_to_gene_end
         self.orphan_distance = orphan_distance
+        self.workers = workers
+        self.buffer_lines = buffer_lines
+        self._output_lines = []
+        self.annotation_cache_dir = annotation_cache_dir
+        self.with_replicon_column = with_replicon_column
     
     def create_tss_list(self):
-        self.tss_list = []
+        self.tss_list = list(self._tss_entries())
+
+    def _tss_entries(self):
         for row in csv.reader(self.tss_list_fh, delimiter="\t"):
             seq_id = None
             if len(row) == 3:
-                seq_id == row[2]
+                seq_id = row[2]
             try:
-                self.tss_list.append(TSS(seq_id, row[0], row[1]))
+                yield TSS(seq_id, row[0], row[1])
             except:
                 sys.stderr.write("Skipping TSS table line: \"%s\"\n" % (
                         "\t".join(row)))
 
     def create_gene_list(self):
         self.gene_list = []
-        gff_parser = Gff3Parser()
-        for entry in gff_parser.entries(self.gff_fh):
-            if entry.feature != "gene":
-                continue
+        if self.annotation_cache_dir is None:
+            entries = Gff3Parser().fast_entries(
+                self.gff_fh, features=["gene"])
+        else:
+            entries = AnnotationCache(self.annotation_cache_dir).load(
+                self.gff_fh.name).records(features=["gene"])
+        for entry in entries:
             self.gene_list.append(Gene(
                     entry.seq_id, entry.attributes["locus_tag"], 
                     entry.attributes["Name"], entry.start, entry.end, 
@@ -68,23 +118,107 @@ class Mapper(object):
     def map_tss(self):
         tss_gene_mapper = tssgenemapper.TSSGeneMapper()
         self.tss_and_genes = tss_gene_mapper.map_tss(
-            self.tss_list, self.gene_list)
+            self.tss_list, self.gene_list, workers=self.workers)
+
+    def map_tss_compact(self):
+        tss_gene_mapper = tssgenemapper.TSSGeneMapper()
+        self.tss_and_genes = tss_gene_mapper.map_tss_compact(
+            self.tss_list, self.gene_list, workers=self.workers)
+
+    def map_sorted_tss_and_write_output(self):
+        """Map and write the TSS one by one.
+
+        The TSS must be sorted by position. The TSS table is
+        read line by line and the output rows are written as soon as
+        the associations of a TSS are known. The memory consumption
+        does not depend on the number of TSS.
+
+        """
+        self.tss_gene_formatter = tssgenemapper.TSSGeneFormatter()
+        self._write_header()
+        tss_gene_mapper = tssgenemapper.TSSGeneMapper()
+        for tss, hit_genes in tss_gene_mapper.map_sorted_tss(
+                self._tss_entries(), self.gene_list):
+            self._write_tss(tss, hit_genes)
+        self._flush_output()
 
     def write_output(self):
         self.tss_gene_formatter = tssgenemapper.TSSGeneFormatter()
         self._write_header()
-        for tss_pos, tss in sorted([(tss.pos, tss) 
-                                    for tss in self.tss_and_genes.keys()]):
-            if tssgenemapper.orphan_str in self.tss_and_genes[tss]:
+        if isinstance(self.tss_and_genes, tssgenemapper.TSSGeneAssociations):
+            self._write_associations(self.tss_and_genes)
+        else:
+            for tss in sorted(self.tss_and_genes.keys(),
+                              key=self._tss_sort_key):
+                self._write_tss(tss, self.tss_and_genes[tss])
+        self._flush_output()
+
+    def _write_tss(self, tss, hit_genes):
+        if tssgenemapper.orphan_str in hit_genes:
+            self._write_orphan(tss)
+        else:
+            for gene in sorted(hit_genes.keys(), key=self._gene_sort_key):
+                self._write_tss_with_gene(tss, gene, hit_genes[gene])
+
+    def _write_associations(self, associations):
+        """Write the rows of a TSSGeneAssociations table sorted by TSS
+        position and gene start.
+
+        """
+        for row in self._association_order(associations).tolist():
+            tss = associations.tss(row)
+            gene = associations.gene(row)
+            if gene is None:
                 self._write_orphan(tss)
-            else:
-                for gene_start, gene in sorted(
-                    [(gene.start, gene) 
-                     for gene in self.tss_and_genes[tss].keys()]):
-                    self._write_tss_with_gene(tss, gene)
-                
-    def _write_tss_with_gene(self, tss, gene):
-        tss_features = self.tss_and_genes[tss][gene]
+                continue
+            bin_features = self.tss_gene_formatter.association_binary_format(
+                associations, row)
+            if not bin_features:
+                continue
+            utr_len = "-"
+            if associations.distance(row) is not None:
+                utr_len = str(associations.distance(row))
+            self._write_row(
+                tss, gene, bin_features,
+                self.tss_gene_formatter.association_string(associations, row),
+                utr_len)
+
+    def _association_order(self, associations):
+        """Return the rows of the association table sorted by TSS and
+        gene (see _tss_sort_key and _gene_sort_key).
+
+        The TSS and genes are ranked once and the rows are sorted by
+        the ranks of their TSS and genes with NumPy.
+
+        """
+        tss_ranks = self._ranks(associations.tss_list, self._tss_sort_key)
+        # Orphan TSS have the gene index -1 and get the gene rank -1.
+        gene_ranks = np.append(self._ranks(
+            associations.gene_list, self._gene_sort_key), -1)
+        tss_indices = associations.numpy_column("tss_indices")
+        gene_indices = associations.numpy_column("gene_indices")
+        return np.lexsort(
+            (gene_ranks[gene_indices], tss_ranks[tss_indices]))
+
+    def _ranks(self, items, sort_key):
+        """Return the positions of the items in the sorted list of
+        items. Items with the same key keep their order.
+
+        """
+        ranks = np.empty(len(items), dtype=np.int64)
+        ranks[sorted(range(len(items)),
+                     key=lambda index: sort_key(items[index]))] = (
+            np.arange(len(items)))
+        return ranks
+
+    def _tss_sort_key(self, tss):
+        # TSS tables without replicon column give TSS with seq_id None.
+        return (tss.seq_id or "", tss.pos, tss.strand)
+
+    def _gene_sort_key(self, gene):
+        return (gene.start, gene.end, gene.gene_id)
+
+    def _write_tss_with_gene(self, tss, gene, tss_features):
         bin_features = self.tss_gene_formatter.tss_features_binary_format(
             tss_features)
         feature_string = self.tss_gene_formatter.tss_features_string(
@@ -96,25 +230,53 @@ class Mapper(object):
         utr_len = "-"
         if (tss_features["location"] == tssgenemapper.loc_5_prime_str):
             utr_len = str(self._utr_length(tss, gene))
-        self.output_fh.write(
-            "\t".join([str(tss.pos), tss.strand] + [
+        self._write_row(tss, gene, bin_features, feature_string, utr_len)
+
+    def _write_row(self, tss, gene, bin_features, feature_string, utr_len):
+        self._write_line(
+            "\t".join(self._tss_columns(tss) + [
                     gene.gene_id, gene.name, str(gene.start), str(gene.end), 
                     gene.strand, str(gene.end-gene.start+1)] + 
-                      bin_features + [feature_string] + [utr_len]) + "\n")
+                      bin_features + [feature_string] + [utr_len]))
 
     def _write_orphan(self, tss):
         bin_features = self.tss_gene_formatter.tss_features_binary_format(
             tssgenemapper.orphan_str)
-        self.output_fh.write(
-            "\t".join([str(tss.pos), tss.strand] + ["-"] * 6 + 
-                       bin_features + ["orphan", "-"]) + "\n")
+        self._write_line(
+            "\t".join(self._tss_columns(tss) + ["-"] * 6 +
+                       bin_features + ["orphan", "-"]))
 
     def _write_header(self):
-        self.output_fh.write("\t".join(
-                ["TSS pos", "TSS strand", "Gene id", "Gene name", 
+        replicon_header = []
+        if self.with_replicon_column is True:
+            replicon_header = ["Replicon"]
+        self._write_line("\t".join(
+                replicon_header +
+                ["TSS pos", "TSS strand", "Gene id", "Gene name",
                  "Gene start", "Gene end", "Gene strand", "Gene length"] +
                 self.tss_gene_formatter.binary_format_header + 
-                ["Status", "UTR length"]) + "\n")
+                ["Status", "UTR length"]))
+
+    def _tss_columns(self, tss):
+        tss_columns = [str(tss.pos), tss.strand]
+        if self.with_replicon_column is True:
+            # TSS tables without replicon column give TSS with seq_id
+            # None.
+            tss_columns.insert(0, tss.seq_id or "-")
+        return tss_columns
+
+    def _write_line(self, line):
+        """Collect output lines and write them in chunks."""
+        self._output_lines.append(line)
+        if len(self._output_lines) >= self.buffer_lines:
+            self._flush_output()
+
+    def _flush_output(self):
+        if len(self._output_lines) == 0:
+            return
+        self.output_fh.write("\n".join(self._output_lines) + "\n")
+        self.output_fh.flush()
+        self._output_lines = []
 
     def _utr_length(self, tss, gene):
         if tss.strand == "+":
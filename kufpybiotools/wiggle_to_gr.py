@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+from kufpybio.helpers import parallel_map
 from kufpybio.wiggle import WiggleParser
 
 __description__ = ""
@@ -13,23 +14,63 @@ import argparse
 
 def main():
     parser = argparse.ArgumentParser(description=__description__)
-    parser.add_argument("input_file")
-    parser.add_argument("--output_prefix", default=None)
+    parser.add_argument("input_files", nargs="+")
+    parser.add_argument(
+        "--output_prefix", default=None,
+        help="Prefix of the output files. If several input files are "
+        "given their track names must differ.")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of processes used to convert the input files.")
     args = parser.parse_args()
     wiggle_to_gr_converter = WiggleToGrConverter()
-    wiggle_to_gr_converter.convert(
-        args.input_file, args.output_prefix)
+    wiggle_to_gr_converter.convert_files(
+        args.input_files, args.output_prefix, args.workers)
 
 class WiggleToGrConverter(object):
 
+    def __init__(self, lines_per_write=100000):
+        self._lines_per_write = lines_per_write
+
+    def convert_files(self, input_files, output_prefix, workers=1):
+        """Convert several wiggle files, with more than one worker in
+        parallel processes.
+
+        """
+        conversion_jobs = [(input_file, output_prefix, self._lines_per_write)
+                           for input_file in input_files]
+        list(parallel_map(_convert_file, conversion_jobs, workers))
+
     def convert(self, input_file, output_prefix):
+        """Write the coverage of each track and replicon of the wiggle
+        file to a separate .gr file.
+
+        The blocks are written one after the other as they are read.
+        Blocks of a track and replicon that has already been written
+        are appended to its file.
+
+        """
         wiggle_parser = WiggleParser()
-        for entry in wiggle_parser.entries(open(input_file)):
-            output_fh = open(self._output_file(
-                    input_file, output_prefix, entry), "w")
-            for pos_value_pair in entry.pos_value_pairs:
-                output_fh.write("\t".join([
-                           str(val) for val in pos_value_pair]) + "\n")
+        written_output_files = set()
+        with open(input_file) as input_fh:
+            for entry in wiggle_parser.fast_entries(input_fh):
+                output_file = self._output_file(
+                    input_file, output_prefix, entry)
+                file_mode = "w"
+                if output_file in written_output_files:
+                    file_mode = "a"
+                with open(output_file, file_mode) as output_fh:
+                    self._write_entry(entry, output_fh)
+                written_output_files.add(output_file)
+
+    def _write_entry(self, entry, output_fh):
+        positions = entry.positions
+        values = entry.values
+        for chunk_start in range(0, len(values), self._lines_per_write):
+            chunk_end = chunk_start + self._lines_per_write
+            output_fh.write("\n".join(map("\t".join, zip(
+                map(str, positions[chunk_start:chunk_end].tolist()),
+                map(repr, values[chunk_start:chunk_end].tolist())))) + "\n")
 
     def _output_file(self, input_file, output_prefix, entry):
         if output_prefix:
@@ -39,5 +80,10 @@ class WiggleToGrConverter(object):
             return("%s_%s_in_%s.gr" % (
                     input_file, entry.track_name, entry.replicon))
 
-if __name__ == "__main__": 
+def _convert_file(conversion_job):
+    """Convert a wiggle file (run by parallel_map)."""
+    input_file, output_prefix, lines_per_write = conversion_job
+    WiggleToGrConverter(lines_per_write).convert(input_file, output_prefix)
+
+if __name__ == "__main__":
    main()
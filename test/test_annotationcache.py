@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from kufpybio.annotationcache import AnnotationCache, is_cacheable
+from kufpybio.gff3 import Gff3Parser
+from kufpybio.gtf import GtfParser
+
+gff3_content = """##gff-version 3
+chrom\tRefSeq\tregion\t1\t1000\t.\t+\t.\tID=chrom
+chrom\tRefSeq\tgene\t100\t200\t.\t+\t.\tID=gene0;Name=abcA;locus_tag=L_01
+chrom\tRefSeq\tCDS\t100\t200\t.\t+\t0\tID=cds0;Parent=gene0
+plasmid\tRefSeq\tgene\t350\t300\t.\t-\t.\tID=gene1;Name=abcB
+"""
+
+class TestAnnotationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+        self.gff_file = os.path.join(self.tmp_dir, "test.gff")
+        with open(self.gff_file, "w") as gff_fh:
+            gff_fh.write(gff3_content)
+        self.annotation_cache = AnnotationCache(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _table_dirs(self):
+        return [file_name for file_name in os.listdir(self.cache_dir)
+                if file_name != "file_stats"]
+
+    def test_records_same_as_parsed_entries(self):
+        parsed_entries = list(Gff3Parser().fast_entries(StringIO(gff3_content)))
+        # First load parses and stores, second one reads the cache
+        for load_counter in range(2):
+            annotation_table = self.annotation_cache.load(self.gff_file)
+            records = list(annotation_table.records())
+            self.assertEqual([str(record) for record in records],
+                             [str(entry) for entry in parsed_entries])
+        self.assertEqual(len(self._table_dirs()), 1)
+
+    def test_records_feature_filter(self):
+        annotation_table = self.annotation_cache.load(self.gff_file)
+        self.assertEqual(
+            [record.attributes["ID"]
+             for record in annotation_table.records(features=["gene"])],
+            ["gene0", "gene1"])
+
+    def test_columns(self):
+        annotation_table = self.annotation_cache.load(self.gff_file)
+        self.assertEqual(len(annotation_table), 4)
+        self.assertEqual(list(annotation_table.starts), [1, 100, 100, 300])
+        self.assertEqual(list(annotation_table.ends), [1000, 200, 200, 350])
+        self.assertEqual(annotation_table.column("strand"),
+                         ["+", "+", "+", "-"])
+
+    def test_changed_file_is_parsed_again(self):
+        self.annotation_cache.load(self.gff_file)
+        with open(self.gff_file, "a") as gff_fh:
+            gff_fh.write(
+                "plasmid\tRefSeq\tgene\t500\t600\t.\t+\t.\tID=gene2\n")
+        self.assertEqual(len(self.annotation_cache.load(self.gff_file)), 5)
+        self.assertEqual(len(self._table_dirs()), 2)
+
+    def test_unchanged_file_is_not_hashed_again(self):
+        hashed_files = []
+        content_hash = self.annotation_cache._content_hash
+        self.annotation_cache._content_hash = lambda gff_file: (
+            hashed_files.append(gff_file) or content_hash(gff_file))
+        for load_counter in range(2):
+            self.annotation_cache.load(self.gff_file)
+        self.assertEqual(hashed_files, [self.gff_file])
+        with open(self.gff_file, "a") as gff_fh:
+            gff_fh.write(
+                "plasmid\tRefSeq\tgene\t500\t600\t.\t+\t.\tID=gene2\n")
+        self.assertEqual(len(self.annotation_cache.load(self.gff_file)), 5)
+        self.assertEqual(hashed_files, [self.gff_file] * 2)
+
+    def test_is_cacheable(self):
+        with open(self.gff_file) as gff_fh:
+            self.assertTrue(is_cacheable(gff_fh))
+        self.assertFalse(is_cacheable(StringIO(gff3_content)))
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(read_fd) as pipe_fh:
+            os.close(write_fd)
+            self.assertFalse(is_cacheable(pipe_fh))
+
+    def test_gtf_records(self):
+        annotation_table = self.annotation_cache.load(
+            self.gff_file, parser=GtfParser())
+        self.assertEqual(
+            type(next(annotation_table.records())).__name__, "GtfRecord")
+
+if __name__ == "__main__":
+    unittest.main()
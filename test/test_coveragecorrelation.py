@@ -0,0 +1,107 @@
+import unittest
+import numpy as np
+from kufpybio.coveragecorrelation import (
+    CoverageCorrelator, CorrelationAccumulator, CorrelationMatrixAccumulator)
+
+class TestCoverageCorrelator(unittest.TestCase):
+
+    def setUp(self):
+        self.coverage_correlator = CoverageCorrelator()
+
+    def test_merge(self):
+        values_1, values_2 = self.coverage_correlator.merge(
+            [1, 3, 7], [2.0, 3.0, 5.0], [3, 9], [1.0, 4.0])
+        self.assertEqual(values_1.tolist(), [2.0, 3.0, 5.0, 0.0])
+        self.assertEqual(values_2.tolist(), [0.0, 1.0, 0.0, 4.0])
+
+    def test_merge_duplicated_positions(self):
+        values_1, values_2 = self.coverage_correlator.merge(
+            [5, 1, 5], [2.0, 3.0, 4.0], [], [])
+        self.assertEqual(values_1.tolist(), [3.0, 4.0])
+        self.assertEqual(values_2.tolist(), [0.0, 0.0])
+
+    def test_merge_libraries(self):
+        value_matrix = self.coverage_correlator.merge_libraries(
+            [[1, 3], [2, 3], []], [[1.0, 1.0], [2.0, 2.0], []])
+        self.assertEqual(value_matrix.tolist(), [
+            [1.0, 0.0, 1.0], [0.0, 2.0, 2.0], [0.0, 0.0, 0.0]])
+
+    def test_correlation_matrix(self):
+        value_matrix = [[2.0, 3.0, 5.0, 1.0, 0.0],
+                        [2.5, 2.0, 6.0, 0.0, 1.0],
+                        [1.0, 2.0, 3.0, 4.0, 5.0]]
+        np.testing.assert_allclose(
+            self.coverage_correlator.correlation_matrix(value_matrix),
+            np.corrcoef(value_matrix))
+        spearman_matrix = self.coverage_correlator.correlation_matrix(
+            value_matrix, method="spearman")
+        self.assertAlmostEqual(spearman_matrix[0, 1], 0.8)
+        self.assertAlmostEqual(spearman_matrix[0, 2], -0.6)
+
+    def test_correlation_matrix_unknown_method(self):
+        with self.assertRaises(ValueError):
+            self.coverage_correlator.correlation_matrix(
+                [[1.0, 2.0]], method="kendall")
+
+    def test_pearson(self):
+        values_1 = [2.0, 3.0, 5.0, 1.0, 0.0]
+        values_2 = [2.5, 2.0, 6.0, 0.0, 1.0]
+        self.assertAlmostEqual(
+            self.coverage_correlator.pearson(values_1, values_2),
+            np.corrcoef(values_1, values_2)[0, 1])
+
+    def test_pearson_constant_values(self):
+        self.assertTrue(np.isnan(self.coverage_correlator.pearson(
+            [1.0, 1.0, 1.0], [1.0, 2.0, 3.0])))
+
+    def test_ranks(self):
+        self.assertEqual(
+            self.coverage_correlator.ranks([3.0, 1.0, 3.0, 2.0]).tolist(),
+            [3.5, 1.0, 3.5, 2.0])
+
+    def test_spearman(self):
+        self.assertAlmostEqual(self.coverage_correlator.spearman(
+            [2.0, 3.0, 5.0, 1.0, 0.0], [2.5, 2.0, 6.0, 0.0, 1.0]), 0.8)
+        self.assertAlmostEqual(self.coverage_correlator.spearman(
+            [1.0, 2.0, 3.0], [1.0, 10.0, 100.0]), 1.0)
+
+class TestCorrelationAccumulator(unittest.TestCase):
+
+    def test_chunks(self):
+        random_state = np.random.RandomState(1)
+        values_1 = random_state.normal(1000.0, 5.0, 10000)
+        values_2 = values_1 * 0.5 + random_state.normal(0.0, 3.0, 10000)
+        correlation_accumulator = CorrelationAccumulator()
+        for chunk_start in range(0, 10000, 777):
+            correlation_accumulator.add(
+                values_1[chunk_start:chunk_start+777],
+                values_2[chunk_start:chunk_start+777])
+        self.assertEqual(correlation_accumulator.value_number, 10000)
+        self.assertAlmostEqual(correlation_accumulator.pearson(),
+                               np.corrcoef(values_1, values_2)[0, 1])
+
+    def test_combine_matrix_accumulators(self):
+        random_state = np.random.RandomState(2)
+        value_matrix = random_state.normal(10.0, 3.0, (4, 1000))
+        value_matrix[1] += value_matrix[0]
+        correlation_matrix_accumulator = CorrelationMatrixAccumulator(4)
+        correlation_matrix_accumulator.add(value_matrix[:, :400])
+        other_correlation_matrix_accumulator = CorrelationMatrixAccumulator(4)
+        other_correlation_matrix_accumulator.add(value_matrix[:, 400:])
+        correlation_matrix_accumulator.add_accumulator(
+            other_correlation_matrix_accumulator)
+        np.testing.assert_allclose(correlation_matrix_accumulator.pearson(),
+                                   np.corrcoef(value_matrix))
+
+    def test_constant_library(self):
+        correlation_matrix_accumulator = CorrelationMatrixAccumulator(2)
+        correlation_matrix_accumulator.add([[1.0, 2.0, 3.0], [1.0, 1.0, 1.0]])
+        self.assertTrue(
+            np.isnan(correlation_matrix_accumulator.pearson()[0, 1]))
+
+    def test_different_lengths(self):
+        with self.assertRaises(ValueError):
+            CorrelationAccumulator().add([1.0, 2.0], [1.0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import random
 import sys
 import kufpybio.genelistmerger as genelistmerger
 from kufpybio.gene import Gene
@@ -10,6 +11,9 @@ class TestTSSGeneMapper_1(unittest.TestCase):
     def setUp(self):
         self.gene_list_merger = genelistmerger.GeneListMerger()
 
+    def tearDown(self):
+        self.gene_list_merger.cleanup()
+
     def test_have_sufficient_overlap_1(self):
         gene_1 = Gene("genomeX", "g", "g" , 1, 50, "+")
         gene_2 = Gene("genomeX", "g", "g" , 200, 450, "+")
@@ -38,6 +42,9 @@ class TestTSSGeneMapper_2(unittest.TestCase):
     def setUp(self):
         self.gene_list_merger = genelistmerger.GeneListMerger(50)
 
+    def tearDown(self):
+        self.gene_list_merger.cleanup()
+
     def test_have_sufficient_overlap_1(self):
         gene_1 = Gene("genomeX", "g", "g" , 1, 100, "+")
         gene_2 = Gene("genomeX", "g", "g" , 50, 150, "+")
@@ -74,5 +81,127 @@ class TestTSSGeneMapper_2(unittest.TestCase):
         self.assertFalse(self.gene_list_merger._have_sufficient_overlap(
             gene_1, gene_2))
 
+class TestGeneListMergerBackends(unittest.TestCase):
+    """The backends must give the same result"""
+
+    def _random_gene_lists(self):
+        random.seed(42)
+        gene_lists = []
+        for list_index in range(3):
+            gene_list = []
+            for gene_index in range(150):
+                start = random.randint(1, 30000)
+                gene_list.append(Gene(
+                    random.choice(["chrom", "plasmid"]),
+                    "g%s_%s" % (list_index, gene_index), "", start,
+                    start + random.randint(0, 800), random.choice("+-")))
+            gene_lists.append(gene_list)
+        return gene_lists
+
+    def _merged_genes(self, backend, *args):
+        gene_list_merger = genelistmerger.GeneListMerger(
+            *args, backend=backend)
+        for gene_list in self._random_gene_lists():
+            gene_list_merger.add_genes(gene_list)
+        merged_genes = [
+            (gene.seq_id, gene.gene_id, gene.name, gene.start, gene.end,
+             gene.strand) for gene in gene_list_merger.merged_genes()]
+        gene_list_merger.cleanup()
+        return merged_genes
+
+    def test_memory_backend_1(self):
+        self.assertEqual(self._merged_genes("memory"),
+                         self._merged_genes("sqlite"))
+
+    def test_memory_backend_2(self):
+        self.assertEqual(self._merged_genes("memory", 30),
+                         self._merged_genes("sqlite", 30))
+
+    def test_memory_backend_3(self):
+        self.assertEqual(self._merged_genes("memory", None, False),
+                         self._merged_genes("sqlite", None, False))
+
+    def test_sqlite_tmp_files_are_unique(self):
+        gene_list_mergers = [genelistmerger.GeneListMerger()
+                             for merger_index in range(2)]
+        gene_list_mergers[0].add_genes([Gene("chrom", "g1", "", 1, 50, "+")])
+        gene_list_mergers[1].add_genes([Gene("chrom", "g2", "", 1, 50, "+")])
+        self.assertEqual(
+            [[gene.gene_id for gene in gene_list_merger.merged_genes()]
+             for gene_list_merger in gene_list_mergers], [["g1"], ["g2"]])
+        for gene_list_merger in gene_list_mergers:
+            gene_list_merger.cleanup()
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            genelistmerger.GeneListMerger(backend="csv")
+
+class TestGeneListMergerMergeSorted(unittest.TestCase):
+
+    def setUp(self):
+        self.gene_lists = [
+            [Gene("chrom", "a", "", 100, 200, "+"),
+             Gene("chrom", "b", "", 500, 600, "+")],
+            [Gene("chrom", "c", "", 150, 300, "+"),
+             Gene("chrom", "d", "", 150, 300, "-"),
+             Gene("chrom", "e", "", 290, 400, "+"),
+             Gene("plasmid", "f", "", 100, 200, "+")]]
+
+    def _merged_genes(self, *args, **kwargs):
+        gene_list_merger = genelistmerger.GeneListMerger(*args, **kwargs)
+        gene_list_merger.merge_sorted(self.gene_lists)
+        merged_genes = [(gene.seq_id, gene.gene_id, gene.start, gene.end,
+                         gene.strand)
+                        for gene in gene_list_merger.merged_genes()]
+        gene_list_merger.cleanup()
+        return merged_genes
+
+    def test_merge_sorted(self):
+        for backend in ["sqlite", "memory"]:
+            self.assertEqual(self._merged_genes(backend=backend), [
+                ("chrom", "a_merged_with_c_merged_with_e", 100, 400, "+"),
+                ("chrom", "b", 500, 600, "+"),
+                ("chrom", "d", 150, 300, "-"),
+                ("plasmid", "f", 100, 200, "+")])
+
+    def test_merge_sorted_min_overlap(self):
+        self.assertEqual(self._merged_genes(30), [
+            ("chrom", "a_merged_with_c", 100, 300, "+"),
+            ("chrom", "b", 500, 600, "+"),
+            ("chrom", "d", 150, 300, "-"),
+            ("plasmid", "f", 100, 200, "+")])
+
+    def test_merge_sorted_min_overlap_same_as_add_genes(self):
+        """Genes overlapping the cluster insufficiently are discarded
+        like by add_genes"""
+        self.gene_lists = [[Gene("chrom", "a", "", 100, 300, "+")],
+                           [Gene("chrom", "b", "", 290, 400, "+")]]
+        gene_list_merger = genelistmerger.GeneListMerger(30, backend="memory")
+        for gene_list in self.gene_lists:
+            gene_list_merger.add_genes(gene_list)
+        self.assertEqual(
+            self._merged_genes(30, backend="memory"),
+            [(gene.seq_id, gene.gene_id, gene.start, gene.end, gene.strand)
+             for gene in gene_list_merger.merged_genes()])
+        gene_list_merger.cleanup()
+        self.assertEqual(self._merged_genes(30), [
+            ("chrom", "a", 100, 300, "+")])
+
+    def test_merge_sorted_without_merging(self):
+        self.assertEqual(self._merged_genes(perform_gene_merging=False), [
+            ("chrom", "a", 100, 200, "+"),
+            ("chrom", "e", 290, 400, "+"),
+            ("chrom", "b", 500, 600, "+"),
+            ("chrom", "d", 150, 300, "-"),
+            ("plasmid", "f", 100, 200, "+")])
+
+    def test_merge_sorted_includes_added_genes(self):
+        gene_list_merger = genelistmerger.GeneListMerger(backend="memory")
+        gene_list_merger.add_genes([Gene("chrom", "x", "", 50, 120, "+")])
+        gene_list_merger.merge_sorted(self.gene_lists[:1])
+        self.assertEqual(
+            [gene.gene_id for gene in gene_list_merger.merged_genes()],
+            ["x_merged_with_a", "b"])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,156 @@
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from kufpybio.gff3 import Gff3Parser, Gff3Entry, Gff3Index
+from kufpybio.gtf import GtfParser
+
+gff3_content = """##gff-version 3
+chrom\tRefSeq\tregion\t1\t1000\t.\t+\t.\tID=chrom
+chrom\tRefSeq\tgene\t100\t200\t.\t+\t.\tID=gene0;Name=abcA;locus_tag=L_01
+chrom\tRefSeq\tCDS\t100\t200\t.\t+\t0\tID=cds0;Parent=gene0
+plasmid\tRefSeq\tgene\t350\t300\t.\t-\t.\tID=gene1;Name=abcB
+##FASTA
+>chrom
+ACGTACGT
+"""
+
+gtf_content = (
+    'chrom\tRefSeq\texon\t10\t20\t.\t+\t.\t'
+    'gene_id "g1"; transcript_id "t1";\n')
+
+class TestGff3Parser(unittest.TestCase):
+
+    def setUp(self):
+        self.gff3_parser = Gff3Parser()
+
+    def test_fast_entries(self):
+        entries = list(self.gff3_parser.fast_entries(StringIO(gff3_content)))
+        self.assertEqual(len(entries), 4)
+        self.assertEqual(entries[1].seq_id, "chrom")
+        self.assertEqual(entries[1].feature, "gene")
+        self.assertEqual(entries[1].start, 100)
+        self.assertEqual(entries[1].end, 200)
+        self.assertEqual(entries[1].attributes["locus_tag"], "L_01")
+        self.assertEqual(str(entries[1]), gff3_content.split("\n")[2])
+
+    def test_fast_entries_same_as_entries(self):
+        entries = list(self.gff3_parser.entries(
+            StringIO(gff3_content.split("##FASTA")[0])))
+        fast_entries = list(self.gff3_parser.fast_entries(
+            StringIO(gff3_content)))
+        self.assertEqual([str(entry) for entry in entries],
+                         [str(entry) for entry in fast_entries])
+        self.assertEqual([entry.attributes for entry in entries],
+                         [entry.attributes for entry in fast_entries])
+
+    def test_fast_entries_feature_filter(self):
+        entries = list(self.gff3_parser.fast_entries(
+            StringIO(gff3_content), features=["gene"]))
+        self.assertEqual([entry.attributes["Name"] for entry in entries],
+                         ["abcA", "abcB"])
+
+    def test_fast_entries_start_end_sorting(self):
+        entry = list(self.gff3_parser.fast_entries(
+            StringIO(gff3_content)))[3]
+        self.assertEqual((entry.start, entry.end), (300, 350))
+
+    def test_fast_entries_add_attribute(self):
+        entry = list(self.gff3_parser.fast_entries(StringIO(gff3_content)))[3]
+        entry.add_attribute("note", "new")
+        self.assertEqual(entry.attribute_string, "ID=gene1;Name=abcB;note=new")
+        self.assertFalse(hasattr(entry, "__dict__"))
+
+    def test_columns(self):
+        columns = self.gff3_parser.columns(
+            StringIO(gff3_content), features=["gene"])
+        self.assertEqual(columns["seq_id"], ["chrom", "plasmid"])
+        self.assertEqual(columns["feature"], ["gene", "gene"])
+        self.assertEqual(list(columns["start"]), [100, 300])
+        self.assertEqual(list(columns["end"]), [200, 350])
+        self.assertEqual(columns["strand"], ["+", "-"])
+
+class TestGff3Fetch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.gff_file = os.path.join(self.tmp_dir, "test.gff")
+        with open(self.gff_file, "w") as gff_fh:
+            gff_fh.write(gff3_content.split("##FASTA")[0])
+        self.gff3_parser = Gff3Parser()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _fetched_ids(self, *args):
+        return [entry.attributes["ID"] for entry in
+                self.gff3_parser.fetch(self.gff_file, *args)]
+
+    def test_fetch_replicon(self):
+        self.assertEqual(self._fetched_ids("chrom"), ["chrom", "gene0", "cds0"])
+        self.assertEqual(self._fetched_ids("plasmid"), ["gene1"])
+        self.assertEqual(self._fetched_ids("phage"), [])
+        self.assertTrue(os.path.exists(self.gff_file + ".idx"))
+
+    def test_fetch_region(self):
+        self.assertEqual(self._fetched_ids("chrom", 150, 170),
+                         ["chrom", "gene0", "cds0"])
+        self.assertEqual(self._fetched_ids("chrom", 201, 300), ["chrom"])
+        self.assertEqual(self._fetched_ids("plasmid", 100, 299), [])
+
+    def test_small_chunks(self):
+        gff_index = Gff3Index(self.gff_file, lines_per_chunk=2)
+        gff_index.build()
+        self.assertEqual(len(gff_index.chunks("chrom")), 2)
+        self.assertEqual(len(gff_index.chunks("chrom", 500, 600)), 1)
+
+    def test_outdated_index_is_rebuilt(self):
+        self.assertEqual(self._fetched_ids("plasmid"), ["gene1"])
+        with open(self.gff_file, "a") as gff_fh:
+            gff_fh.write(
+                "plasmid\tRefSeq\tgene\t500\t600\t.\t+\t.\tID=gene2\n")
+        os.utime(self.gff_file, (0, 0))
+        self.assertEqual(self._fetched_ids("plasmid", 550, 560), ["gene2"])
+
+class TestGff3Entry(unittest.TestCase):
+
+    def setUp(self):
+        self.gff3_entry = Gff3Entry({
+            "seq_id" : "chrom", "source" : "MyLab", "feature" : "sRNA",
+            "start" : 20, "end" : 10, "strand" : "+", "score" : ".",
+            "phase" : ".", "attributes" : "name=abc;locus_tag=L_01"})
+
+    def test_lazy_attributes(self):
+        self.assertIsNone(self.gff3_entry._attribute_dict)
+        self.assertEqual(self.gff3_entry.attributes,
+                         {"name" : "abc", "locus_tag" : "L_01"})
+
+    def test_add_attribute(self):
+        self.gff3_entry.add_attribute("note", "new")
+        self.assertEqual(self.gff3_entry.attribute_string,
+                         "name=abc;locus_tag=L_01;note=new")
+        self.assertEqual(self.gff3_entry.attributes["note"], "new")
+
+class TestGtfParser(unittest.TestCase):
+
+    def test_fast_entries(self):
+        entry = list(GtfParser().fast_entries(StringIO(gtf_content)))[0]
+        self.assertEqual(entry.attributes["transcript_id"], '"t1"')
+
+    def test_entries(self):
+        entry = list(GtfParser().entries(StringIO(gtf_content)))[0]
+        self.assertIsNone(entry._attribute_dict)
+        self.assertEqual(entry.attributes["gene_id"], '"g1"')
+
+    def test_add_attribute(self):
+        for entries in [GtfParser().entries(StringIO(gtf_content)),
+                        GtfParser().fast_entries(StringIO(gtf_content))]:
+            entry = list(entries)[0]
+            entry.add_attribute("exon_number", '"1"')
+            self.assertEqual(
+                entry.attribute_string,
+                'gene_id "g1"; transcript_id "t1"; exon_number "1"')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,5 +12,12 @@ class TestHelpers(unittest.TestCase):
         self.assertEqual(helpers.overlap(0, 100, 101, 300), 0)
         self.assertEqual(helpers.overlap(0, 100, 200, 300), 0)
 
+    def test_parallel_map(self):
+        for workers in [1, 3]:
+            self.assertEqual(
+                list(helpers.parallel_map(abs, [-3, 1, -2, 5], workers)),
+                [3, 1, 2, 5])
+        self.assertEqual(list(helpers.parallel_map(abs, [], 3)), [])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,125 @@
+import random
+import unittest
+from kufpybio.igrfinder import IGRFinder
+from kufpybio.gene import Gene
+
+def _per_nucleotide_igrs(gene_list, element_length):
+    """Reference implementation that marks every nucleotide."""
+    nucleotides = ["i"] * element_length
+    for gene in gene_list:
+        nucleotides[gene.start:gene.end] = ["g"] * (gene.end - gene.start)
+    igr_positions = []
+    curr_igr_start = 0
+    prev_nucl_val = nucleotides[0]
+    for index, nucl_val in enumerate(nucleotides):
+        if prev_nucl_val == "i" and nucl_val == "g":
+            igr_positions.append((curr_igr_start+1, index-1))
+        elif prev_nucl_val == "g" and nucl_val == "i":
+            curr_igr_start = index
+        prev_nucl_val = nucl_val
+    if prev_nucl_val == "i":
+        igr_positions.append((curr_igr_start+1, len(nucleotides)-1))
+    return igr_positions
+
+class TestIGRFinder(unittest.TestCase):
+
+    def setUp(self):
+        self.igr_finder = IGRFinder()
+
+    def _gene(self, start, end, strand="+", seq_id="chrom"):
+        return Gene(seq_id, "g_%s_%s" % (start, end), "", start, end, strand)
+
+    def test_find_igrs_1(self):
+        gene_list = [self._gene(10, 20), self._gene(30, 50)]
+        self.assertEqual(
+            self.igr_finder.find_igrs(gene_list, 100),
+            [(1, 9), (21, 29), (51, 99)])
+
+    def test_find_igrs_overlapping_genes(self):
+        gene_list = [self._gene(30, 50), self._gene(10, 35),
+                     self._gene(40, 45)]
+        self.assertEqual(
+            self.igr_finder.find_igrs(gene_list, 100), [(1, 9), (51, 99)])
+
+    def test_find_igrs_genes_at_borders(self):
+        gene_list = [self._gene(0, 20), self._gene(20, 50),
+                     self._gene(60, 100)]
+        self.assertEqual(self.igr_finder.find_igrs(gene_list, 100), [(51, 59)])
+
+    def test_find_igrs_no_genes(self):
+        self.assertEqual(self.igr_finder.find_igrs([], 100), [(1, 99)])
+
+    def test_find_igrs_random_against_per_nucleotide(self):
+        random.seed(7)
+        for trial in range(500):
+            element_length = random.randint(1, 300)
+            gene_list = []
+            for gene_counter in range(random.randint(0, 8)):
+                start = random.randint(0, element_length - 1)
+                end = min(element_length, start + random.randint(0, 60))
+                gene_list.append(self._gene(start, end))
+            self.assertEqual(
+                self.igr_finder.find_igrs(gene_list, element_length),
+                _per_nucleotide_igrs(gene_list, element_length))
+
+    def test_find_igrs_per_strand(self):
+        gene_list = [self._gene(10, 20, "+"), self._gene(30, 50, "-")]
+        self.assertEqual(
+            self.igr_finder.find_igrs_per_strand(gene_list, 100),
+            {"+": [(1, 9), (21, 99)], "-": [(1, 29), (51, 99)]})
+
+    def test_find_igrs_per_replicon(self):
+        gene_list = [self._gene(10, 20, seq_id="chrom"),
+                     self._gene(30, 50, seq_id="plasmid"),
+                     self._gene(5, 8, seq_id="unknown")]
+        self.assertEqual(
+            self.igr_finder.find_igrs_per_replicon(
+                gene_list, {"chrom": 100, "plasmid": 60, "phage": 10}),
+            {"chrom": [(1, 9), (21, 99)], "plasmid": [(1, 29), (51, 59)],
+             "phage": [(1, 9)]})
+
+    def test_find_igrs_per_replicon_and_strand(self):
+        gene_list = [self._gene(10, 20, "+", "chrom"),
+                     self._gene(30, 50, "-", "chrom")]
+        self.assertEqual(
+            self.igr_finder.find_igrs_per_replicon(
+                gene_list, {"chrom": 100}, per_strand=True),
+            {"chrom": {"+": [(1, 9), (21, 99)], "-": [(1, 29), (51, 99)]}})
+
+class TestIGRFinderWithMask(unittest.TestCase):
+
+    def setUp(self):
+        self.igr_finder = IGRFinder(use_mask=True)
+
+    def _gene(self, start, end, strand="+"):
+        return Gene("chrom", "g_%s_%s" % (start, end), "", start, end, strand)
+
+    def test_find_igrs_1(self):
+        gene_list = [self._gene(10, 20), self._gene(30, 50)]
+        self.assertEqual(
+            self.igr_finder.find_igrs(gene_list, 100),
+            [(1, 9), (21, 29), (51, 99)])
+
+    def test_gene_mask(self):
+        gene_list = [self._gene(2, 4), self._gene(3, 6)]
+        self.igr_finder.find_igrs(gene_list, 8)
+        self.assertEqual(
+            self.igr_finder.gene_mask.tolist(),
+            [False, False, True, True, True, True, False, False])
+
+    def test_find_igrs_random_against_intervals(self):
+        random.seed(11)
+        interval_igr_finder = IGRFinder()
+        for trial in range(500):
+            element_length = random.randint(0, 300)
+            gene_list = []
+            for gene_counter in range(random.randint(0, 8)):
+                start = random.randint(0, element_length + 5)
+                gene_list.append(
+                    self._gene(start, start + random.randint(0, 60)))
+            self.assertEqual(
+                self.igr_finder.find_igrs(gene_list, element_length),
+                interval_igr_finder.find_igrs(gene_list, element_length))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from kufpybio.intervalindex import IntervalIndex
+
+class TestIntervalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.interval_index = IntervalIndex([
+            (10, 100, "a"), (90, 200, "b"), (300, 400, "c"),
+            (1, 1000, "d")])
+
+    def test_len(self):
+        self.assertEqual(len(self.interval_index), 4)
+
+    def test_overlapping_1(self):
+        self.assertEqual(
+            sorted(self.interval_index.overlapping(95, 98)), ["a", "b", "d"])
+
+    def test_overlapping_2(self):
+        """Borders are inclusive"""
+        self.assertEqual(
+            sorted(self.interval_index.overlapping(200, 300)),
+            ["b", "c", "d"])
+
+    def test_overlapping_3(self):
+        self.assertEqual(
+            sorted(self.interval_index.overlapping(201, 299)), ["d"])
+
+    def test_overlapping_4(self):
+        self.assertEqual(self.interval_index.overlapping(1001, 2000), [])
+
+    def test_overlapping_empty_index(self):
+        self.assertEqual(IntervalIndex([]).overlapping(1, 10), [])
+
+if __name__ == "__main__":
+    unittest.main()
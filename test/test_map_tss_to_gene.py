@@ -0,0 +1,91 @@
+import os
+import sys
+import unittest
+from io import StringIO
+from unittest import mock
+from kufpybiotools.map_tss_to_gene import Mapper, main
+
+gff_content = (
+    "##gff-version 3\n"
+    "chr\tRefSeq\tgene\t100\t200\t.\t+\t.\tID=g1;Name=a;locus_tag=L1\n"
+    "pl\tRefSeq\tgene\t120\t300\t.\t+\t.\tID=g2;Name=b;locus_tag=L2\n")
+
+class TestMapper(unittest.TestCase):
+
+    def setUp(self):
+        self.tss_content = "90\t+\tchr\n90\t+\tpl\n"
+        self.gff_content = gff_content
+
+    def _output_rows(self, mapping_mode, workers=1,
+                     with_replicon_column=False):
+        output_fh = StringIO()
+        mapper = Mapper(StringIO(self.tss_content),
+                        StringIO(self.gff_content),
+                        output_fh, 100, 300, workers=workers,
+                        with_replicon_column=with_replicon_column)
+        mapper.create_gene_list()
+        if mapping_mode == "sorted":
+            mapper.map_sorted_tss_and_write_output()
+        else:
+            mapper.create_tss_list()
+            if mapping_mode == "compact":
+                mapper.map_tss_compact()
+            else:
+                mapper.map_tss()
+            mapper.write_output()
+        return [line.split("\t")
+                for line in output_fh.getvalue().splitlines()]
+
+    def test_colliding_tss_positions_on_two_replicons(self):
+        for mapping_mode, workers in [("default", 1), ("default", 2),
+                                      ("compact", 1), ("sorted", 1)]:
+            rows = self._output_rows(mapping_mode, workers)
+            self.assertEqual(
+                rows[0][:3], ["TSS pos", "TSS strand", "Gene id"])
+            self.assertEqual(
+                [row[:3] + [row[-1]] for row in rows[1:]],
+                [["90", "+", "L1", "10"], ["90", "+", "L2", "30"]])
+
+    def test_compact_output_same_as_default(self):
+        self.tss_content = "".join(
+            ["%s\t%s\t%s\n" % (pos, strand, replicon)
+             for replicon in ["pl", "chr"]
+             for pos in [510, 90, 150, 91, 700]
+             for strand in ["-", "+"]])
+        self.gff_content = gff_content + (
+            "chr\tRefSeq\tgene\t140\t600\t.\t-\t.\tID=g3;Name=c;"
+            "locus_tag=L3\n"
+            "chr\tRefSeq\tgene\t140\t500\t.\t+\t.\tID=g4;Name=d;"
+            "locus_tag=L4\n")
+        rows = self._output_rows("default")
+        self.assertEqual(self._output_rows("compact"), rows)
+        # Header and 20 TSS of which some hit several genes
+        self.assertEqual(len(rows), 30)
+
+    def test_with_replicon_column(self):
+        for mapping_mode in ["default", "compact", "sorted"]:
+            rows = self._output_rows(
+                mapping_mode, with_replicon_column=True)
+            self.assertEqual(
+                rows[0][:3], ["Replicon", "TSS pos", "TSS strand"])
+            self.assertEqual(
+                [row[:4] for row in rows[1:]],
+                [["chr", "90", "+", "L1"], ["pl", "90", "+", "L2"]])
+
+    def test_tss_without_replicon(self):
+        self.tss_content = "90\t+\n"
+        rows = self._output_rows("default", with_replicon_column=True)
+        self.assertEqual([row[:4] for row in rows[1:]],
+                         [["-", "90", "+", "L1"]])
+
+    def test_annotation_cache_requires_gff_file(self):
+        with mock.patch.object(sys, "argv", [
+                "map_tss_to_gene.py", os.devnull, "-", os.devnull,
+                "--annotation_cache_dir", "cache"]):
+            with mock.patch.object(sys, "stderr", StringIO()) as stderr:
+                with self.assertRaises(SystemExit):
+                    main()
+        self.assertIn("--annotation_cache_dir", stderr.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
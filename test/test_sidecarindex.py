@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+from kufpybio.sidecarindex import SidecarIndex, SidecarIndexCache
+
+class LineCountIndex(SidecarIndex):
+
+    builds = 0
+
+    def _build_index(self):
+        LineCountIndex.builds += 1
+        with open(self._indexed_file) as indexed_fh:
+            self.line_number = len(indexed_fh.readlines())
+
+    def _index_data(self):
+        return {"line_number" : self.line_number}
+
+    def _set_index_data(self, index_data):
+        self.line_number = index_data["line_number"]
+
+class TestSidecarIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.indexed_file = os.path.join(self.tmp_dir, "test.txt")
+        with open(self.indexed_file, "w") as indexed_fh:
+            indexed_fh.write("a\nb\n")
+        LineCountIndex.builds = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_saved_index_is_loaded(self):
+        LineCountIndex(self.indexed_file).load_or_build()
+        self.assertTrue(os.path.exists(self.indexed_file + ".idx"))
+        index = LineCountIndex(self.indexed_file)
+        index.load_or_build()
+        self.assertEqual(index.line_number, 2)
+        self.assertEqual(LineCountIndex.builds, 1)
+
+    def test_outdated_index_is_rebuilt(self):
+        index_cache = SidecarIndexCache(LineCountIndex)
+        self.assertEqual(index_cache.index(self.indexed_file).line_number, 2)
+        self.assertEqual(index_cache.index(self.indexed_file).line_number, 2)
+        with open(self.indexed_file, "a") as indexed_fh:
+            indexed_fh.write("c\n")
+        os.utime(self.indexed_file, (0, 0))
+        self.assertEqual(index_cache.index(self.indexed_file).line_number, 3)
+        self.assertEqual(LineCountIndex.builds, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import random
 import sys
 from io import StringIO
 import kufpybio.tssgenemapper as tssgenemapper
@@ -268,6 +269,159 @@ class TestTSSGeneMapper(unittest.TestCase):
             self.tss_gene_mapper.tss_and_hit_genes[tss_secondary][
                 gene]["tss_type"], tssgenemapper.secondary_str)
 
+    def _random_tss_and_genes(self):
+        random.seed(23)
+        gene_list = []
+        for gene_index in range(200):
+            start = random.randint(1, 20000)
+            gene_list.append(Gene(
+                "genomeX", "g%s" % gene_index, "g%s" % gene_index, start,
+                start + random.randint(0, 1500), random.choice("+-")))
+        tss_list = [TSS("genomeX", pos, strand) for pos, strand in
+                    random.sample(
+                        [(pos, strand) for pos in range(1, 22000)
+                         for strand in "+-"], 500)]
+        return tss_list, gene_list
+
+    def test_map_tss_same_as_checking_all_genes(self):
+        tss_list, gene_list = self._random_tss_and_genes()
+        # Reference: Check every TSS-gene pair
+        reference_mapper = tssgenemapper.TSSGeneMapper()
+        reference_mapper.tss_and_hit_genes = {}
+        reference_mapper.genes_and_5_prime_tss = {}
+        for tss in tss_list:
+            for gene in gene_list:
+                reference_mapper._check_tss_gene_associations(tss, gene)
+            if tss not in reference_mapper.tss_and_hit_genes:
+                reference_mapper.tss_and_hit_genes[tss] = {
+                    tssgenemapper.orphan_str : {
+                        'distance': None, 'location': tssgenemapper.orphan_str,
+                        'tss_type': tssgenemapper.orphan_str}}
+        reference_mapper._set_type_of_5_prime_tss()
+        reference_mapper._remove_multiple_associations()
+        tss_and_hit_genes = self.tss_gene_mapper.map_tss(tss_list, gene_list)
+        self.assertEqual(
+            list(tss_and_hit_genes.items()),
+            list(reference_mapper.tss_and_hit_genes.items()))
+
+    def test_map_sorted_tss_same_as_map_tss(self):
+        tss_list, gene_list = self._random_tss_and_genes()
+        tss_list.sort(key=lambda tss: tss.pos)
+        gene_list.sort(key=lambda gene: gene.start)
+        tss_and_hit_genes = self.tss_gene_mapper.map_tss(tss_list, gene_list)
+        self.assertEqual(
+            list(tssgenemapper.TSSGeneMapper().map_sorted_tss(
+                tss_list, gene_list)),
+            [(tss, tss_and_hit_genes[tss]) for tss in tss_list])
+
+    def test_map_sorted_tss_unsorted_genes(self):
+        tss_list, gene_list = self._random_tss_and_genes()
+        tss_list.sort(key=lambda tss: tss.pos)
+        gene_list.sort(key=lambda gene: gene.start)
+        tss_and_hit_genes = list(self.tss_gene_mapper.map_sorted_tss(
+            tss_list, gene_list))
+        self.assertEqual(
+            list(tssgenemapper.TSSGeneMapper().map_sorted_tss(
+                tss_list, sorted(gene_list, key=lambda gene: -gene.start))),
+            tss_and_hit_genes)
+
+    def test_map_sorted_tss_unsorted_input(self):
+        tss_list = [TSS("genomeX", 100, "+"), TSS("genomeX", 50, "+")]
+        with self.assertRaises(ValueError):
+            list(self.tss_gene_mapper.map_sorted_tss(tss_list, []))
+
+    def test_map_sorted_tss_interleaved_replicons(self):
+        tss_list = [TSS("chrom", 50, "+"), TSS("plasmid", 60, "+"),
+                    TSS("chrom", 100, "+")]
+        with self.assertRaises(ValueError):
+            list(self.tss_gene_mapper.map_sorted_tss(tss_list, []))
+
+    def _multi_replicon_tss_and_genes(self):
+        gene_list = [
+            Gene("chrom", "g1", "g1", 100, 200, "+"),
+            Gene("plasmid", "g2", "g2", 100, 200, "+"),
+            Gene("chrom", "g3", "g3", 500, 600, "-")]
+        tss_list = [
+            TSS("plasmid", 90, "+"), TSS("chrom", 80, "+"),
+            TSS("chrom", 550, "+"), TSS("phage", 90, "+")]
+        return tss_list, gene_list
+
+    def test_map_tss_respects_seq_id(self):
+        tss_list, gene_list = self._multi_replicon_tss_and_genes()
+        tss_and_hit_genes = self.tss_gene_mapper.map_tss(tss_list, gene_list)
+        self.assertEqual(list(tss_and_hit_genes.keys()), tss_list)
+        self.assertEqual(list(tss_and_hit_genes[tss_list[0]].keys()),
+                         [gene_list[1]])
+        self.assertEqual(list(tss_and_hit_genes[tss_list[1]].keys()),
+                         [gene_list[0]])
+        self.assertEqual(list(tss_and_hit_genes[tss_list[2]].keys()),
+                         [gene_list[2]])
+        self.assertEqual(list(tss_and_hit_genes[tss_list[3]].keys()),
+                         [tssgenemapper.orphan_str])
+
+    def test_map_tss_without_seq_id(self):
+        """TSS without seq_id can be associated with genes on all replicons"""
+        tss_list = [TSS(None, 90, "+")]
+        tss_and_hit_genes = self.tss_gene_mapper.map_tss(
+            tss_list, self._multi_replicon_tss_and_genes()[1])
+        self.assertEqual(
+            [gene.gene_id for gene in tss_and_hit_genes[tss_list[0]]], ["g1"])
+
+    def test_map_tss_with_workers(self):
+        tss_list, gene_list = self._multi_replicon_tss_and_genes()
+        self.assertEqual(
+            list(tssgenemapper.TSSGeneMapper().map_tss(
+                tss_list, gene_list, workers=2).items()),
+            list(self.tss_gene_mapper.map_tss(tss_list, gene_list).items()))
+
+    def test_map_sorted_tss_multi_replicon(self):
+        tss_list, gene_list = self._multi_replicon_tss_and_genes()
+        tss_and_hit_genes = self.tss_gene_mapper.map_tss(tss_list, gene_list)
+        self.assertEqual(
+            list(tssgenemapper.TSSGeneMapper().map_sorted_tss(
+                tss_list, gene_list)),
+            [(tss, tss_and_hit_genes[tss]) for tss in tss_list])
+
+    def test_map_tss_compact_same_as_map_tss(self):
+        tss_list, gene_list = self._random_tss_and_genes()
+        tss_and_hit_genes = self.tss_gene_mapper.map_tss(tss_list, gene_list)
+        associations = tssgenemapper.TSSGeneMapper().map_tss_compact(
+            tss_list, gene_list)
+        self.assertEqual(list(associations.tss_and_hit_genes().items()),
+                         list(tss_and_hit_genes.items()))
+
+    def test_map_tss_compact_multiple_5_prime_associations(self):
+        """Leaderless and further 5' associations are resolved like in
+        map_tss"""
+        gene_list = [
+            Gene("genomeX", "g1", "g1", 100, 150, "+"),
+            Gene("genomeX", "g2", "g2", 200, 300, "+"),
+            Gene("genomeX", "g3", "g3", 250, 400, "+"),
+            Gene("genomeX", "g4", "g4", 50, 100, "-")]
+        tss_list = [TSS("genomeX", 100, "+"), TSS("genomeX", 200, "+"),
+                    TSS("genomeX", 90, "+"), TSS("genomeX", 120, "-")]
+        tss_and_hit_genes = self.tss_gene_mapper.map_tss(tss_list, gene_list)
+        associations = tssgenemapper.TSSGeneMapper().map_tss_compact(
+            tss_list, gene_list)
+        self.assertEqual(list(associations.tss_and_hit_genes().items()),
+                         list(tss_and_hit_genes.items()))
+
+    def test_map_tss_compact_empty(self):
+        associations = self.tss_gene_mapper.map_tss_compact([], [])
+        self.assertEqual(len(associations), 0)
+
+    def test_map_tss_compact_with_workers(self):
+        tss_list, gene_list = self._multi_replicon_tss_and_genes()
+        associations = self.tss_gene_mapper.map_tss_compact(
+            tss_list, gene_list, workers=2)
+        self.assertEqual(list(associations.tss_indices), [0, 1, 2, 3])
+        self.assertEqual(list(associations.gene_indices), [1, 0, 2, -1])
+        self.assertEqual(
+            [associations.tss_type(row) for row in range(len(associations))],
+            [tssgenemapper.primary_str, tssgenemapper.primary_str,
+             tssgenemapper.loc_antisense_str, tssgenemapper.orphan_str])
+        self.assertEqual(list(associations.distances), [10, 20, -1, -1])
+
 class TestTSSGeneFormatter(unittest.TestCase):
 
     def setUp(self):
@@ -299,5 +453,19 @@ class TestTSSGeneFormatter(unittest.TestCase):
                     "location" : tssgenemapper.loc_antisense_str}),
             ["0", "0", "0", "1"])
 
+    def test_association_binary_format(self):
+        tss_list = [TSS("genomeX", 10, "+"), TSS("genomeX", 500, "+")]
+        gene_list = [Gene("genomeX", "g", "g" , 50, 100, "+")]
+        associations = tssgenemapper.TSSGeneMapper().map_tss_compact(
+            tss_list, gene_list)
+        self.assertEqual(
+            [self.tss_gene_formatter.association_binary_format(
+                associations, row) for row in range(len(associations))],
+            [["1", "0", "0", "0"], ["0", "0", "0", "0"]])
+        self.assertEqual(
+            [self.tss_gene_formatter.association_string(associations, row)
+             for row in range(len(associations))],
+            ["5' region - primary", "orphan"])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,348 @@
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO, StringIO
+import numpy as np
+from kufpybio.wiggle import (
+    WiggleParser, WiggleEntry, WiggleIndex, WiggleWriter,
+    BinaryCoverageWriter, BinaryCoverageReader)
+
+wiggle_content = (
+    "track type=wiggle_0 name=\"track1\"\n"
+    "variableStep chrom=chrom1 span=1\n"
+    "1 2.0\n"
+    "5 3.5\n"
+    "8 1.0\n"
+    "variableStep chrom=chrom2 span=10\n"
+    "20 1.0\n"
+    "40 2.0\n"
+    "track type=wiggle_0 name=\"track2\"\n"
+    "fixedStep chrom=chrom1 start=3 step=2\n"
+    "1\n"
+    "2\n"
+    "3\n"
+    "4\n")
+
+class TestWiggleParser(unittest.TestCase):
+
+    def setUp(self):
+        self.wiggle_parser = WiggleParser()
+        self.wiggle_fh = StringIO(
+            "track type=wiggle_0 name=\"test\"\n"
+            "variableStep chrom=chrom1 span=1\n"
+            "1 2.0\n"
+            "5 3.5\n"
+            "variableStep chrom=chrom2 span=1\n"
+            "7 1\n")
+
+    def test_entries(self):
+        entries = list(self.wiggle_parser.entries(self.wiggle_fh))
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].track_name, "test")
+        self.assertEqual(entries[0].replicon, "chrom1")
+        self.assertEqual(entries[0].positions.tolist(), [1, 5])
+        self.assertEqual(entries[0].values.tolist(), [2.0, 3.5])
+        self.assertEqual(entries[1].replicon, "chrom2")
+        self.assertEqual(entries[1].pos_value_pairs, [[7, 1.0]])
+
+    def test_entries_span(self):
+        entries = list(self.wiggle_parser.entries(StringIO(
+            "variableStep chrom=chrom1 span=25\n"
+            "1 2.0\n"
+            "variableStep chrom=chrom2\n"
+            "7 1\n")))
+        self.assertEqual([entry.span for entry in entries], [25, 1])
+
+    def test_entries_fixed_step(self):
+        entries = list(self.wiggle_parser.entries(StringIO(
+            "browser position chrom1:1-100\n"
+            "track type=wiggle_0 name=\"test\"\n"
+            "# comment\n"
+            "fixedStep chrom=chrom1 start=11 step=5 span=5\n"
+            "1.5\n"
+            "2\n"
+            "3\n"
+            "variableStep chrom=chrom1\n"
+            "100 4\n"
+            "fixedStep chrom=chrom2 start=1\n"
+            "7\n")))
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(entries[0].start, 11)
+        self.assertEqual(entries[0].step, 5)
+        self.assertEqual(entries[0].span, 5)
+        self.assertEqual(entries[0].positions.tolist(), [11, 16, 21])
+        self.assertEqual(entries[0].values.tolist(), [1.5, 2.0, 3.0])
+        self.assertEqual(entries[1].pos_value_pairs, [[100, 4.0]])
+        self.assertEqual(entries[2].step, 1)
+        self.assertEqual(entries[2].pos_value_pairs, [[1, 7.0]])
+
+    def _assert_same_entries(self, entries, fast_entries):
+        self.assertEqual(len(entries), len(fast_entries))
+        for entry, fast_entry in zip(entries, fast_entries):
+            self.assertEqual(
+                [entry.track_name, entry.replicon, entry.span, entry.start,
+                 entry.step, entry.pos_value_pairs],
+                [fast_entry.track_name, fast_entry.replicon, fast_entry.span,
+                 fast_entry.start, fast_entry.step,
+                 fast_entry.pos_value_pairs])
+
+    def test_fast_entries(self):
+        wiggle_content = (
+            "track type=wiggle_0 name=\"test\"\n"
+            "# comment\n"
+            "variableStep chrom=chrom1 span=1\n"
+            "1 2.0\n"
+            "5 -3.5\n"
+            "\n"
+            "fixedStep chrom=chrom1 start=11 step=5\n"
+            "1.5\n"
+            "1e3\n"
+            "variableStep chrom=chrom2\n"
+            "7 0.125")
+        entries = list(self.wiggle_parser.entries(StringIO(wiggle_content)))
+        for chunk_size in [1, 10, 2**24]:
+            self._assert_same_entries(entries, list(
+                self.wiggle_parser.fast_entries(
+                    StringIO(wiggle_content), chunk_size=chunk_size)))
+
+    def test_track_names(self):
+        for entries in [self.wiggle_parser.entries(StringIO(wiggle_content)),
+                        self.wiggle_parser.fast_entries(
+                            StringIO(wiggle_content))]:
+            self.assertEqual([entry.track_name for entry in entries],
+                             ["track1", "track1", "track2"])
+
+    def test_fast_entries_invalid_data_line(self):
+        for wiggle_content in ["variableStep chrom=chrom1\n1 x\n",
+                               "variableStep chrom=chrom1\n1\n"]:
+            with self.assertRaises(ValueError):
+                list(self.wiggle_parser.fast_entries(
+                    StringIO(wiggle_content)))
+
+class TestWiggleFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.wiggle_file = os.path.join(self.tmp_dir, "test.wig")
+        with open(self.wiggle_file, "w") as wiggle_fh:
+            wiggle_fh.write(wiggle_content)
+        self.wiggle_parser = WiggleParser()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _fetched(self, *args):
+        return [(entry.track_name, entry.pos_value_pairs) for entry in
+                self.wiggle_parser.fetch(self.wiggle_file, *args)]
+
+    def test_fetch_replicon(self):
+        self.assertEqual(
+            self._fetched("chrom1"),
+            [("track1", [[1, 2.0], [5, 3.5], [8, 1.0]]),
+             ("track2", [[3, 1.0], [5, 2.0], [7, 3.0], [9, 4.0]])])
+        self.assertEqual(self._fetched("chrom3"), [])
+        self.assertTrue(os.path.exists(self.wiggle_file + ".idx"))
+
+    def test_fetch_region(self):
+        self.assertEqual(
+            self._fetched("chrom1", 4, 7),
+            [("track1", [[5, 3.5]]), ("track2", [[5, 2.0], [7, 3.0]])])
+        self.assertEqual(self._fetched("chrom1", 4, 7, "track2"),
+                         [("track2", [[5, 2.0], [7, 3.0]])])
+
+    def test_fetch_region_with_span(self):
+        self.assertEqual(self._fetched("chrom2", 25, 30),
+                         [("track1", [[20, 1.0]])])
+
+    def test_fetch_fixed_step(self):
+        entry = list(self.wiggle_parser.fetch(
+            self.wiggle_file, "chrom1", 6, None, "track2"))[0]
+        self.assertEqual(entry.start, 7)
+        self.assertEqual(entry.step, 2)
+        self.assertEqual(entry.values.tolist(), [3.0, 4.0])
+
+    def test_small_chunks(self):
+        wiggle_index = WiggleIndex(self.wiggle_file, lines_per_chunk=1)
+        wiggle_index.build()
+        self.assertEqual(len(wiggle_index.blocks("chrom1")), 2)
+        self.assertEqual(len(wiggle_index.blocks("chrom1", 10, 20)), 0)
+        self.assertEqual(
+            len(wiggle_index.blocks("chrom1")[1]["chunks"]), 4)
+
+    def test_outdated_index_is_rebuilt(self):
+        self.assertEqual(self._fetched("chrom3"), [])
+        with open(self.wiggle_file, "a") as wiggle_fh:
+            wiggle_fh.write("variableStep chrom=chrom3\n5 1\n")
+        os.utime(self.wiggle_file, (0, 0))
+        self.assertEqual(self._fetched("chrom3"), [("track2", [[5, 1.0]])])
+
+class TestWiggleEntry(unittest.TestCase):
+
+    def test_init_with_pos_value_pairs(self):
+        wiggle_entry = WiggleEntry(
+            "test", "chrom1", None, [[1, 2.0], [3, 4.0]])
+        self.assertEqual(wiggle_entry.positions.dtype, np.int64)
+        self.assertEqual(wiggle_entry.positions.tolist(), [1, 3])
+        self.assertEqual(wiggle_entry.values.tolist(), [2.0, 4.0])
+        self.assertEqual(len(wiggle_entry), 2)
+
+    def test_init_with_arrays(self):
+        wiggle_entry = WiggleEntry(
+            "test", "chrom1", None, positions=[1, 3], values=[2, 4])
+        self.assertEqual(wiggle_entry.values.dtype, np.float64)
+        self.assertEqual(wiggle_entry.pos_value_pairs, [[1, 2.0], [3, 4.0]])
+
+    def test_fixed_step(self):
+        wiggle_entry = WiggleEntry(
+            "test", "chrom1", 1, values=[1, 2], start=5, step=10)
+        self.assertEqual(len(wiggle_entry), 2)
+        self.assertEqual(wiggle_entry.pos_value_pairs, [[5, 1.0], [15, 2.0]])
+        wiggle_entry.positions = [1, 2]
+        self.assertEqual(wiggle_entry.step, None)
+        self.assertEqual(wiggle_entry.pos_value_pairs, [[1, 1.0], [2, 2.0]])
+
+    def test_init_empty(self):
+        wiggle_entry = WiggleEntry("test", "chrom1", None)
+        self.assertEqual(wiggle_entry.pos_value_pairs, [])
+
+class TestWiggleWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.output_fh = StringIO()
+        self.wiggle_writer = WiggleWriter("test", self.output_fh, chunk_size=2)
+
+    def test_write_pos_value_pairs(self):
+        self.wiggle_writer.write_replicons_coverages(
+            "chrom1", [[1, 2.0], [2, 0.0], [3, 3], [4, 1.5]], factor=2.0)
+        self.assertEqual(
+            self.output_fh.getvalue(),
+            "track type=wiggle_0 name=\"test\"\n"
+            "variableStep chrom=chrom1 span=1\n"
+            "1 4.0\n3 6.0\n4 3.0\n")
+
+    def test_write_pos_value_pair_iterator(self):
+        self.wiggle_writer.write_replicons_coverages(
+            "chrom1", zip([1, 2, 3], [2.0, 0.0, 1.5]))
+        self.assertEqual(
+            self.output_fh.getvalue().split("\n")[1:],
+            ["variableStep chrom=chrom1 span=1", "1 2.0", "3 1.5", ""])
+
+    def test_write_non_integer_positions(self):
+        self.wiggle_writer.write_replicons_coverages(
+            "chrom1", [["1", 2.0], [2.5, 1.0], [3, 1.5]],
+            min_fixed_step_length=2)
+        self.assertEqual(
+            self.output_fh.getvalue().split("\n")[1:],
+            ["variableStep chrom=chrom1 span=1", "1 2.0", "2.5 1.0",
+             "3 1.5", ""])
+
+    def test_write_arrays(self):
+        self.wiggle_writer.write_replicons_coverages(
+            "chrom1", positions=np.array([1, 5, 6]),
+            values=np.array([0.1, 0.1, 0.0]))
+        self.assertEqual(
+            self.output_fh.getvalue().split("\n")[1:],
+            ["variableStep chrom=chrom1 span=1", "1 0.1", "5 0.1", ""])
+
+    def test_write_fixed_step(self):
+        self.wiggle_writer.write_replicons_coverages(
+            "chrom1", positions=[1, 2, 3, 4, 10, 20, 21, 30, 31, 32],
+            values=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10], min_fixed_step_length=3)
+        self.assertEqual(
+            self.output_fh.getvalue().split("\n")[1:],
+            ["fixedStep chrom=chrom1 start=1 step=1 span=1",
+             "1.0", "2.0", "3.0", "4.0",
+             "variableStep chrom=chrom1 span=1",
+             "10 5.0", "20 6.0", "21 7.0",
+             "fixedStep chrom=chrom1 start=30 step=1 span=1",
+             "8.0", "9.0", "10.0", ""])
+        self.output_fh.seek(0)
+        entries = list(WiggleParser().entries(self.output_fh))
+        self.assertEqual(
+            np.concatenate([entry.positions for entry in entries]).tolist(),
+            [1, 2, 3, 4, 10, 20, 21, 30, 31, 32])
+
+class TestBinaryCoverage(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = list(WiggleParser().entries(StringIO(wiggle_content)))
+        self.entries.append(WiggleEntry("track2", "chrom3", 1))
+        self.coverage_fh = BytesIO()
+        binary_coverage_writer = BinaryCoverageWriter(
+            self.coverage_fh, positions_per_chunk=2, zoom_bin_sizes=(4, 100))
+        for entry in self.entries:
+            binary_coverage_writer.write_entry(entry)
+        binary_coverage_writer.close()
+        self.binary_coverage_reader = BinaryCoverageReader(self.coverage_fh)
+
+    def _entry_data(self, entry):
+        return [entry.track_name, entry.replicon, entry.span, entry.start,
+                entry.step, entry.pos_value_pairs]
+
+    def test_entries(self):
+        self.assertEqual(
+            [self._entry_data(entry)
+             for entry in self.binary_coverage_reader.entries()],
+            [self._entry_data(entry) for entry in self.entries])
+
+    def test_replicons(self):
+        self.assertEqual(self.binary_coverage_reader.replicons(),
+                         ["chrom1", "chrom2", "chrom3"])
+
+    def test_fetch(self):
+        self.assertEqual(
+            [(entry.track_name, entry.pos_value_pairs) for entry in
+             self.binary_coverage_reader.fetch("chrom1", 4, 7)],
+            [("track1", [[5, 3.5]]), ("track2", [[5, 2.0], [7, 3.0]])])
+        self.assertEqual(
+            [entry.pos_value_pairs for entry in
+             self.binary_coverage_reader.fetch("chrom2", 25, 30)],
+            [[[20, 1.0]]])
+        fixed_step_entry = list(self.binary_coverage_reader.fetch(
+            "chrom1", 6, None, "track2"))[0]
+        self.assertEqual([fixed_step_entry.start, fixed_step_entry.step],
+                         [7, 2])
+
+    def test_zoom(self):
+        summary = list(self.binary_coverage_reader.zoom(
+            "chrom1", 4, track_name="track1"))[0]
+        self.assertEqual(summary["bin_starts"].tolist(), [1, 5])
+        self.assertEqual(summary["bin_ends"].tolist(), [4, 8])
+        self.assertEqual(summary["value_numbers"].tolist(), [1, 2])
+        self.assertEqual(summary["sums"].tolist(), [2.0, 4.5])
+        self.assertEqual(summary["minima"].tolist(), [2.0, 1.0])
+        self.assertEqual(summary["maxima"].tolist(), [2.0, 3.5])
+        self.assertEqual(summary["means"].tolist(), [2.0, 2.25])
+        summary = list(self.binary_coverage_reader.zoom(
+            "chrom1", 4, 5, 100, "track1"))[0]
+        self.assertEqual(summary["bin_starts"].tolist(), [5])
+
+    def test_zoom_unknown_bin_size(self):
+        with self.assertRaises(ValueError):
+            list(self.binary_coverage_reader.zoom("chrom1", 5))
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            BinaryCoverageReader(BytesIO(b"track type=wiggle_0\n"))
+
+    def test_unsorted_positions(self):
+        entry = WiggleEntry("track1", "chrom1", 1, positions=[5, 3, 10, 8],
+                            values=[1.0, 2.0, 3.0, 4.0])
+        coverage_fh = BytesIO()
+        binary_coverage_writer = BinaryCoverageWriter(
+            coverage_fh, positions_per_chunk=3, zoom_bin_sizes=(4,))
+        binary_coverage_writer.write_entry(entry)
+        binary_coverage_writer.close()
+        binary_coverage_reader = BinaryCoverageReader(coverage_fh)
+        self.assertEqual(
+            [entry.pos_value_pairs
+             for entry in binary_coverage_reader.entries()],
+            [[[5, 1.0], [3, 2.0], [10, 3.0], [8, 4.0]]])
+        self.assertEqual(
+            [entry.pos_value_pairs
+             for entry in binary_coverage_reader.fetch("chrom1", 3, 4)],
+            [[[3, 2.0]]])
+
+if __name__ == "__main__":
+    unittest.main()